@@ -0,0 +1,79 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict
+
+from core.utils import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+TEMPLATE = ROOT / 'example' / 'template.json'
+
+DEFAULT_REPEAT = 7
+
+# each step runs in a fresh interpreter and prints how long its body took
+STEPS = {
+    'import': 'import core',
+    'config': 'from core.template import load_template\n'
+              f'load_template({str(TEMPLATE)!r})',
+    'first_banner': 'from core import GeneratorFactory\n'
+                    'from core.template import load_template\n'
+                    f'generator = GeneratorFactory.banner(load_template({str(TEMPLATE)!r}))\n'
+                    "generator.generate_bytes(header='Steins;Gate', main_text='#3 anime in history',"
+                    " subheader='STEINS;GATE')",
+}
+
+RUNNER = '''import time
+started = time.perf_counter()
+{body}
+print(time.perf_counter() - started)
+'''
+
+
+def measure_step(body: str) -> float:
+    out = subprocess.run([sys.executable, '-c', RUNNER.format(body=body)], cwd=ROOT, check=True,
+                         capture_output=True, text=True).stdout
+
+    return float(out.split()[-1])
+
+
+def measure_process() -> float:
+    # whole interpreter start-up plus the first banner, what a CLI or serverless call pays
+    started = time.perf_counter()
+    measure_step(STEPS['first_banner'])
+
+    return time.perf_counter() - started
+
+
+def summary(samples) -> dict:
+    return {'p50_ms': round(percentile(samples, 50) * 1000, 3), 'min_ms': round(min(samples) * 1000, 3)}
+
+
+def run(repeat: int = DEFAULT_REPEAT) -> Dict[str, dict]:
+    results = {}
+
+    for name, body in STEPS.items():
+        samples = [measure_step(body) for _ in range(repeat)]
+        results[name] = summary(samples)
+
+    results['process'] = summary([measure_process() for _ in range(repeat)])
+
+    return results
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(prog='python -m benchmarks.coldstart',
+                                 description='Import and first-banner time in fresh interpreters')
+
+    ap.add_argument('-r', '--repeat', type=int, default=DEFAULT_REPEAT,
+                    help='Fresh interpreters per step')
+
+    args = ap.parse_args(args)
+
+    print(json.dumps(run(args.repeat), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import PIL
+
+import core
+from core import measure, utils
+from core.encoding import EncoderOptions
+from core.instrument import Recorder
+from core.template import load_template
+from core.utils import percentile
+
+from benchmarks import coldstart
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = coldstart.ROOT
+TEMPLATE = coldstart.TEMPLATE
+RESULTS_DIR = ROOT / 'benchmarks' / 'results'
+
+DEFAULT_REPEAT = 5
+
+# report stage -> instrumentation span
+STAGES = {
+    'fitting': 'fit',
+    'wrapping': 'wrap',
+    'layout': 'layout',
+    'drawing': 'draw',
+    'compositing': 'composite',
+    'encoding': 'encode',
+    'other': 'render',
+}
+
+
+def datasets() -> Dict[str, List[dict]]:
+    # the datasets the visual tests are built from, resolved relative to the repository root
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        from tests import test_main
+    finally:
+        os.chdir(cwd)
+
+    return {
+        'average': list(test_main.get_average_anime()),
+        'shortest': list(test_main.get_shortest_anime()),
+        'longest': list(test_main.get_longest_anime()),
+    }
+
+
+def clear_caches():
+    utils.load_font.cache_clear()
+    utils._fit_fontsize.cache_clear()
+    measure.clear_cache()
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def timed(fn: Callable, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+
+    return result, time.perf_counter() - started
+
+
+def ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def bench_dataset(generator: core.BannerGenerator, records: List[dict], options: EncoderOptions,
+                  repeat: int) -> dict:
+    recorder = generator.instrument
+    recorder.reset()
+    latencies = []
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for record in records:
+            _, seconds = timed(generator.generate_bytes, options=options, **record)
+            latencies.append(seconds)
+    elapsed = time.perf_counter() - started
+
+    spans = {stage: recorder.totals.get(span, 0.0) for stage, span in STAGES.items()}
+    # layout and render spans enclose the others, keep only what they spent outside them
+    spans['layout'] -= spans['fitting'] + spans['wrapping']
+    spans['other'] -= spans['drawing'] + spans['compositing']
+
+    return {
+        'banners': len(latencies),
+        'seconds': round(elapsed, 4),
+        'banners_per_sec': round(len(latencies) / elapsed, 2),
+        'latency_ms': {
+            'mean': ms(sum(latencies) / len(latencies)),
+            'p50': ms(percentile(latencies, 50)),
+            'p95': ms(percentile(latencies, 95)),
+            'p99': ms(percentile(latencies, 99)),
+        },
+        'stages_ms': {stage: ms(seconds) for stage, seconds in spans.items()},
+        'counters': dict(recorder.counters),
+    }
+
+
+def run(names: Iterable[str], repeat: int = DEFAULT_REPEAT, options: Optional[EncoderOptions] = None,
+        cold_start: bool = True) -> dict:
+    options = options or EncoderOptions()
+    data = datasets()
+
+    clear_caches()
+    config, cold = timed(lambda: load_template(TEMPLATE).load())
+    _, warm = timed(lambda: load_template(TEMPLATE).load())
+
+    generator = core.GeneratorFactory.banner(config, instrument=Recorder())
+    results = {name: bench_dataset(generator, data[name], options, repeat) for name in names}
+
+    banners = sum(result['banners'] for result in results.values())
+    seconds = sum(result['seconds'] for result in results.values())
+
+    return {
+        'version': core.__version__,
+        'python': platform.python_version(),
+        'pillow': PIL.__version__,
+        'platform': platform.platform(),
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'repeat': repeat,
+        'format': options.format,
+        'config_ms': {'cold': ms(cold), 'warm': ms(warm)},
+        'datasets': results,
+        'total': {
+            'banners': banners,
+            'seconds': round(seconds, 4),
+            'banners_per_sec': round(banners / seconds, 2) if seconds else None,
+        },
+        'peak_rss_mb': peak_rss_mb(),
+        'cold_start': coldstart.run() if cold_start else None,
+    }
+
+
+def change(old: Optional[float], new: Optional[float]) -> str:
+    if not old or new is None:
+        return '-'
+
+    return f'{(new - old) / old * 100:+.1f}%'
+
+
+def report(result: dict, baseline: Optional[dict] = None) -> str:
+    lines = [f'anime-embedded {result["version"]}, Python {result["python"]}, Pillow {result["pillow"]}, '
+             f'{result["format"]} x{result["repeat"]}',
+             f'config load: {result["config_ms"]["cold"]} ms cold, {result["config_ms"]["warm"]} ms warm',
+             '']
+
+    header = f'{"dataset":<10} {"banners/s":>10} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}'
+    if baseline is not None:
+        header += f' {"Δ rate":>8} {"Δ p95":>8}'
+    lines.append(header)
+
+    for name, data in result['datasets'].items():
+        latency = data['latency_ms']
+        line = (f'{name:<10} {data["banners_per_sec"]:>10} {latency["p50"]:>9} {latency["p95"]:>9} '
+                f'{latency["p99"]:>9}')
+
+        old = (baseline or {}).get('datasets', {}).get(name)
+        if baseline is not None:
+            line += (f' {change(old and old["banners_per_sec"], data["banners_per_sec"]):>8}'
+                     f' {change(old and old["latency_ms"]["p95"], latency["p95"]):>8}')
+        lines.append(line)
+
+    stages = defaultdict(float)
+    for data in result['datasets'].values():
+        for stage, value in data['stages_ms'].items():
+            stages[stage] += value
+    total = sum(stages.values()) or 1
+
+    lines += ['', 'time by stage:']
+    lines += [f'  {stage:<12} {value:>10.1f} ms {value / total * 100:>5.1f}%' for stage, value in stages.items()]
+    lines += ['', f'peak RSS: {result["peak_rss_mb"]} MB']
+
+    if result.get('cold_start'):
+        lines += ['', 'cold start, fresh interpreter:']
+        lines += [f'  {step:<12} {data["p50_ms"]:>10.1f} ms' for step, data in result['cold_start'].items()]
+
+    return '\n'.join(lines)
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(prog='python -m benchmarks.run', description='Benchmark banner rendering')
+
+    ap.add_argument('-d', '--dataset', action='append', choices=('average', 'shortest', 'longest'),
+                    help='Dataset to run, may be repeated, defaults to all')
+    ap.add_argument('-r', '--repeat', type=int, default=DEFAULT_REPEAT,
+                    help='Passes over each dataset')
+    ap.add_argument('-f', '--format', default='JPEG',
+                    help='Encoder format')
+    ap.add_argument('-o', '--output',
+                    help=f'Results JSON, defaults to {RESULTS_DIR.relative_to(ROOT)}/<version>.json')
+    ap.add_argument('--skip-cold-start', action='store_true',
+                    help='Leave out the fresh-interpreter import and first-banner timings')
+    ap.add_argument('--compare',
+                    help='Earlier results JSON to report the change against')
+
+    args = ap.parse_args(args)
+
+    options = EncoderOptions(args.format)
+    options.check()
+
+    result = run(args.dataset or ('average', 'shortest', 'longest'), args.repeat, options, not args.skip_cold_start)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f'{result["version"]}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+    print(report(result, baseline))
+    print(f'\nresults written to {output}')
+
+
+if __name__ == '__main__':
+    main()
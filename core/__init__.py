@@ -1,4 +1,48 @@
-from .main import Config, GeneratorFactory, BannerGenerator
-from .utils import resize, make_transparent, bruteforce, find_suitable_fontsize
+import importlib
+
+# Names are imported from their modules on first access (PEP 562), so `import core` stays cheap for
+# short-lived processes that only need part of the package
+_exports = {
+    'Config': 'main',
+    'GeneratorFactory': 'main',
+    'BannerGenerator': 'main',
+    'AsyncBannerGenerator': 'aio',
+    'RenderCache': 'cache',
+    'AssetCache': 'assets',
+    'EncoderOptions': 'encoding',
+    'available_formats': 'encoding',
+    'Instrument': 'instrument',
+    'Recorder': 'instrument',
+    'CanvasPool': 'pool',
+    'IncrementalRenderer': 'incremental',
+    'LayoutPlan': 'layout',
+    'TextItem': 'layout',
+    'Variant': 'variants',
+    'ConfigSpec': 'template',
+    'draw_text': 'text',
+    'mask_cache_info': 'text',
+    'mask_cache_clear': 'text',
+    'resize': 'utils',
+    'make_transparent': 'utils',
+    'bruteforce': 'utils',
+    'find_suitable_fontsize': 'utils',
+    'load_font': 'utils',
+}
+
+__all__ = list(_exports)
 
 __version__ = '0.0.1'
+
+
+def __getattr__(name: str):
+    if name not in _exports:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(importlib.import_module(f'.{_exports[name]}', __name__), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports))
@@ -0,0 +1,162 @@
+import asyncio
+import os
+import weakref
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import AsyncIterable, AsyncIterator, Iterable, Optional, Set, Tuple, Union
+
+from PIL.Image import Image as ImageType
+
+from core.batch import RECORD_FIELDS, shutdown
+from core.encoding import EncoderOptions
+from core.main import BannerGenerator
+
+
+class AsyncBannerGenerator:
+    # Coroutine versions of the generate calls for asyncio services. Renders run on `executor`, a
+    # ThreadPoolExecutor whose threads share the generator (None starts one of `concurrency` threads; for
+    # worker processes use batch.make_executor and batch.render_bytes instead), and at most
+    # `concurrency` of them are in flight per event loop. A timed out or cancelled call stops waiting at once;
+    # its slot is only given back when the render actually ends, threads can't be interrupted
+    generator: BannerGenerator
+    executor: Optional[Executor]
+    concurrency: int
+    timeout: Optional[float]
+
+    def __init__(self, generator: BannerGenerator, executor: Optional[Executor] = None,
+                 concurrency: Optional[int] = None, timeout: Optional[float] = None):
+        if executor is not None and not isinstance(executor, ThreadPoolExecutor):
+            # the generator and the calls on it are not picklable, they can't go to another process
+            raise TypeError(f'executor must be a ThreadPoolExecutor, not {type(executor).__name__}')
+
+        self.generator = generator
+        self.executor = executor
+        self.concurrency = concurrency or os.cpu_count() or 1
+        self.timeout = timeout
+
+        self.__owns_executor = executor is None
+        self.__semaphores = weakref.WeakKeyDictionary()
+        self.__submitted: Set[Future] = set()
+
+    async def agenerate(self, header: str, main_text: str, subheader: Optional[str] = None,
+                        small_text: Optional[str] = None, timeout: Optional[float] = None) -> ImageType:
+        return await self.__run(timeout, self.generator.generate, header, main_text, subheader, small_text)
+
+    async def agenerate_bytes(self, header: str, main_text: str, subheader: Optional[str] = None,
+                              small_text: Optional[str] = None, options: Optional[EncoderOptions] = None,
+                              timeout: Optional[float] = None) -> bytes:
+        # bytes rather than a view of the encoder's buffer, the result outlives the worker thread
+        def render() -> bytes:
+            return bytes(self.generator.generate_bytes(header, main_text, subheader, small_text, options=options))
+
+        return await self.__run(timeout, render)
+
+    async def agenerate_file(self, fp, header: str, main_text: str, subheader: Optional[str] = None,
+                             small_text: Optional[str] = None, options: Optional[EncoderOptions] = None,
+                             timeout: Optional[float] = None):
+        await self.__run(timeout, self.generator.generate_file, fp, header, main_text, subheader, small_text, options)
+
+    async def agenerate_many(self, records: Union[Iterable[dict], AsyncIterable[dict]], ordered: bool = True,
+                             timeout: Optional[float] = None) -> AsyncIterator[Tuple[int, ImageType]]:
+        # Like batch.generate_many: (index, image) pairs as renders finish, or in input order when ordered.
+        # Records are read at most 2 * concurrency ahead of the consumer; leaving the loop early cancels
+        # whatever is still pending
+        window = self.concurrency * 2
+        items = _aenumerate(records)
+        pending = deque() if ordered else {}
+
+        def submit(record: dict) -> asyncio.Task:
+            fields = {key: record[key] for key in RECORD_FIELDS if key in record}
+            return asyncio.ensure_future(self.agenerate(**fields, timeout=timeout))
+
+        try:
+            exhausted = False
+
+            while True:
+                while not exhausted and len(pending) < window:
+                    try:
+                        index, record = await items.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                    else:
+                        if ordered:
+                            pending.append((index, submit(record)))
+                        else:
+                            pending[submit(record)] = index
+
+                if not pending:
+                    break
+
+                if ordered:
+                    index, task = pending.popleft()
+                    yield index, await task
+                    continue
+
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield pending.pop(task), task.result()
+        finally:
+            for task in pending:
+                (task[1] if ordered else task).cancel()
+
+    def __semaphore(self) -> asyncio.Semaphore:
+        # asyncio primitives belong to one event loop
+        loop = asyncio.get_running_loop()
+
+        semaphore = self.__semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self.__semaphores[loop] = asyncio.Semaphore(self.concurrency)
+
+        return semaphore
+
+    def __executor(self) -> Executor:
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='arender')
+
+        return self.executor
+
+    async def __run(self, timeout: Optional[float], fn, *args):
+        # the timeout covers waiting for a slot as well as the render
+        return await asyncio.wait_for(self.__submit(fn, *args), timeout if timeout is not None else self.timeout)
+
+    async def __submit(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        semaphore = self.__semaphore()
+
+        await semaphore.acquire()
+        try:
+            future = self.__executor().submit(fn, *args)
+        except BaseException:
+            semaphore.release()
+            raise
+
+        self.__submitted.add(future)
+        future.add_done_callback(self.__submitted.discard)
+        future.add_done_callback(lambda _: _call_soon(loop, semaphore.release))
+
+        return await asyncio.wrap_future(future)
+
+    def close(self):
+        # only the pool started here, an executor that was passed in belongs to the caller
+        if self.__owns_executor and self.executor is not None:
+            shutdown(self.executor, self.__submitted, wait=False)
+            self.executor = None
+
+
+def _call_soon(loop: asyncio.AbstractEventLoop, callback):
+    try:
+        loop.call_soon_threadsafe(callback)
+    except RuntimeError:
+        # the loop is already closed, nothing is waiting on the semaphore any more
+        pass
+
+
+async def _aenumerate(records: Union[Iterable[dict], AsyncIterable[dict]]) -> AsyncIterator[Tuple[int, dict]]:
+    if hasattr(records, '__aiter__'):
+        index = 0
+        async for record in records:
+            yield index, record
+            index += 1
+    else:
+        for index, record in enumerate(records):
+            yield index, record
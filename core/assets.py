@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional, Union
+
+from PIL import Image
+from PIL.Image import Image as ImageType
+
+from core.utils import file_digest, make_transparent, resize
+
+ASSET_VERSION = 1
+
+RESAMPLING = {
+    'nearest': Image.NEAREST,
+    'box': Image.BOX,
+    'bilinear': Image.BILINEAR,
+    'hamming': Image.HAMMING,
+    'bicubic': Image.BICUBIC,
+    'lanczos': Image.LANCZOS,
+}
+
+# modes that survive a round trip through a plain uint8 array
+ARRAY_MODES = ('L', 'RGB', 'RGBA', 'RGBa')
+
+
+def prepare(path: Union[str, Path], transparent: bool = False, scale: Optional[float] = None,
+            resample: Optional[str] = None, premultiplied: bool = False) -> ImageType:
+    image = make_transparent(path) if transparent else Image.open(path)
+
+    if scale is not None:
+        image = resize(image, scale, RESAMPLING[resample] if resample is not None else None)
+
+    if premultiplied:
+        image = image.convert('RGBa')
+
+    return image
+
+
+class AssetCache:
+    # Logos and overlays decoded, made transparent and resized once, stored as raw .npy arrays keyed by
+    # the source file's hash and the transform. A hit is an mmap, no decode, convert or resize
+    directory: Path
+
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(path: Union[str, Path], transparent: bool = False, scale: Optional[float] = None,
+            resample: Optional[str] = None, premultiplied: bool = False) -> str:
+        payload = json.dumps([ASSET_VERSION, file_digest(path), transparent, scale, resample, premultiplied])
+
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path(self, key: str, mode: str) -> Path:
+        return self.directory / f'{key}.{mode}.npy'
+
+    def load(self, path: Union[str, Path], transparent: bool = False, scale: Optional[float] = None,
+             resample: Optional[str] = None, premultiplied: bool = False) -> ImageType:
+        if resample is not None and resample not in RESAMPLING:
+            raise ValueError(f'unknown resampling filter {resample!r}, expected one of {", ".join(RESAMPLING)}')
+
+        key = self.key(path, transparent, scale, resample, premultiplied)
+
+        for mode in ARRAY_MODES:
+            entry = self.path(key, mode)
+
+            if entry.exists():
+                self.hits += 1
+                return self.__open(entry, mode)
+
+        self.misses += 1
+        image = prepare(path, transparent, scale, resample, premultiplied)
+
+        if image.mode not in ARRAY_MODES:
+            # palette images and the like are returned as they are, there is nothing to gain from caching them
+            return image
+
+        image.load()
+        self.__store(self.path(key, image.mode), image)
+
+        return image
+
+    @staticmethod
+    def __open(entry: Path, mode: str) -> ImageType:
+        # numpy only when there is a cache to read, templates load without it
+        import numpy as np
+
+        array = np.load(entry, mmap_mode='r')
+        height, width = array.shape[:2]
+
+        # shares the mapped pages, Pillow copies before any write to the image
+        return Image.frombuffer(mode, (width, height), array, 'raw', mode, 0, 1)
+
+    def __store(self, entry: Path, image: ImageType):
+        import numpy as np
+
+        # RGBa has no numpy interface of its own, its bytes are laid out exactly like RGBA
+        data = np.asarray(image if image.mode != 'RGBa' else Image.frombytes('RGBA', image.size, image.tobytes()))
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.ascontiguousarray(data))
+            os.replace(tmp, entry)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def clear(self):
+        for entry in self.directory.glob('*.npy'):
+            entry.unlink()
+
+        self.hits = 0
+        self.misses = 0
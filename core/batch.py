@@ -0,0 +1,194 @@
+import functools
+import io
+import os
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Iterable, Iterator, Optional, Tuple, Any, Union
+
+from core.cache import RenderCache
+from core.encoding import EncoderOptions
+from core.main import BannerGenerator, Config
+from core.template import ConfigSpec
+
+RECORD_FIELDS = ('header', 'main_text', 'subheader', 'small_text')
+
+# One generator per worker process, built once by the pool initializer. Thread workers don't use it, their
+# generator is bound to each call so any number of thread pools can run side by side in one process
+_generator: Optional[BannerGenerator] = None
+
+
+WARM_UP = {'header': 'Fruits Basket: The Final', 'main_text': 'The best anime ever!',
+           'subheader': 'Fruits Basket The Final', 'small_text': 'based on'}
+
+
+def worker_config(config: Config) -> Union[Config, ConfigSpec]:
+    # a spec pickles to a few hundred bytes and each worker builds its Config once; otherwise decode the
+    # images up front so forked workers don't share lazily opened file handles
+    return config.spec if config.spec is not None else config.load()
+
+
+def make_generator(config: Union[Config, ConfigSpec], cache: Optional[RenderCache],
+                   warm: bool = False) -> BannerGenerator:
+    if isinstance(config, ConfigSpec):
+        config = config.config()
+    generator = BannerGenerator(config, cache=cache)
+
+    if warm:
+        # composes the static base and loads the fonts before the first real request arrives
+        generator.render(generator.layout(**WARM_UP))
+
+    return generator
+
+
+def init_worker(config: Union[Config, ConfigSpec], cache: Optional[RenderCache], warm: bool = False):
+    global _generator
+
+    _generator = make_generator(config, cache, warm)
+
+
+def make_executor(config: Config, cache: Optional[RenderCache], workers: int, threads: bool = False,
+                  warm: bool = False) -> Executor:
+    # Threads share a single generator, see bind; Pillow releases the GIL while drawing, pasting and
+    # encoding, so they still render in parallel. Processes scale further but each holds its own generator
+    if threads:
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='render')
+
+    return ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                               initargs=(worker_config(config), cache, warm))
+
+
+def shutdown(executor: Executor, submitted: Iterable[Future], wait: bool = True):
+    # cancel what hasn't started yet, then shut down; by hand, shutdown(cancel_futures=True) needs Python 3.9
+    for future in list(submitted):
+        future.cancel()
+
+    executor.shutdown(wait=wait)
+
+
+def bind(fn: Callable, generator: Optional[BannerGenerator]) -> Callable:
+    # fn with the generator of a thread pool, or fn itself for process workers that use their own
+    return fn if generator is None else functools.partial(fn, generator=generator)
+
+
+def _fields(record: dict) -> dict:
+    return {key: record[key] for key in RECORD_FIELDS if key in record}
+
+
+def render(record: dict, generator: Optional[BannerGenerator] = None):
+    return (generator or _generator).generate(**_fields(record))
+
+
+def render_bytes(record: dict, generator: Optional[BannerGenerator] = None) -> Tuple[bytes, bool]:
+    generator = generator or _generator
+    options = EncoderOptions(**record.get('options', {}))
+
+    data, hit = generator._generate_into(io.BytesIO(), **_fields(record), options=options)
+
+    return bytes(data), hit
+
+
+def render_file(record: dict, generator: Optional[BannerGenerator] = None):
+    options = EncoderOptions(**record['options']) if record.get('options') else None
+    (generator or _generator).generate_file(record['fp'], **_fields(record), options=options)
+
+    return record['fp']
+
+
+def counted(fn: Callable, record: dict) -> Tuple[Any, Tuple[int, int, int]]:
+    # fn's result and the cache hits, misses and evictions it took, for the parent to add to its own cache
+    cache = _generator.cache
+    if cache is None:
+        return fn(record), (0, 0, 0)
+
+    before = cache.counts()
+    result = fn(record)
+
+    return result, tuple(after - start for after, start in zip(cache.counts(), before))
+
+
+def imap_bounded(executor: Executor, fn: Callable, iterable: Iterable, window: int,
+                 ordered: bool = True) -> Iterator[Tuple[int, Any]]:
+    # Unlike Executor.map, never submits more than `window` items ahead of the consumer,
+    # so arbitrarily long record streams run in constant memory. An error reading the input is raised
+    # after the items already submitted have been yielded
+    failed = []
+    items = _guarded(enumerate(iterable), failed)
+
+    if ordered:
+        pending = deque()
+
+        for index, item in items:
+            pending.append((index, executor.submit(fn, item)))
+
+            if len(pending) >= window:
+                index, future = pending.popleft()
+                yield index, future.result()
+
+        while pending:
+            index, future = pending.popleft()
+            yield index, future.result()
+    else:
+        pending = {}
+        exhausted = False
+
+        while True:
+            while not exhausted and len(pending) < window:
+                try:
+                    index, item = next(items)
+                except StopIteration:
+                    exhausted = True
+                else:
+                    pending[executor.submit(fn, item)] = index
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+
+    if failed:
+        raise failed[0]
+
+
+def _guarded(items: Iterator, failed: list) -> Iterator:
+    try:
+        yield from items
+    except Exception as e:
+        failed.append(e)
+
+
+def _map(fn: Callable, config: Config, records: Iterable[dict], workers: Optional[int], ordered: bool,
+         cache: Optional[RenderCache], threads: bool = False,
+         generator: Optional[BannerGenerator] = None) -> Iterator[Tuple[int, Any]]:
+    workers = workers or os.cpu_count() or 1
+
+    if threads:
+        # the threads use the caller's cache object, its counts are already kept
+        if generator is None:
+            generator = make_generator(config, cache)
+
+        with make_executor(config, cache, workers, threads) as executor:
+            yield from imap_bounded(executor, bind(fn, generator), records, window=workers * 2, ordered=ordered)
+        return
+
+    with make_executor(config, cache, workers) as executor:
+        for index, (result, counts) in imap_bounded(executor, functools.partial(counted, fn), records,
+                                                    window=workers * 2, ordered=ordered):
+            if cache is not None:
+                cache.add_counts(*counts)
+
+            yield index, result
+
+
+def generate_many(config: Config, records: Iterable[dict], workers: Optional[int] = None,
+                  ordered: bool = True, cache: Optional[RenderCache] = None, threads: bool = False,
+                  generator: Optional[BannerGenerator] = None) -> Iterator[Tuple[int, Any]]:
+    # generator: the one thread workers share, a new one by default
+    return _map(render, config, records, workers, ordered, cache, threads, generator)
+
+
+def generate_many_files(config: Config, records: Iterable[dict], workers: Optional[int] = None,
+                        ordered: bool = True, cache: Optional[RenderCache] = None, threads: bool = False,
+                        generator: Optional[BannerGenerator] = None) -> Iterator[Tuple[int, Any]]:
+    return _map(render_file, config, records, workers, ordered, cache, threads, generator)
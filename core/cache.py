@@ -0,0 +1,315 @@
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows, only threads of one process are kept in step
+    fcntl = None
+
+# Bump whenever a change to the rendering code alters output, so stale entries stop matching
+RENDER_VERSION = 1
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# a full cache is trimmed to this share of max_bytes, so the next puts don't each scan the directory again
+EVICT_TO = 0.9
+
+
+def make_key(fingerprint: str, fields: dict, fmt: str, options: Optional[dict] = None) -> str:
+    payload = json.dumps(
+        {
+            'version': RENDER_VERSION,
+            'config': fingerprint,
+            'fields': fields,
+            'format': fmt,
+            'options': options or {},
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    # Entries are files under `directory`, which is the only shared state: any number of generators, threads
+    # and worker processes may use one directory. Its total size is kept in a small file that every put
+    # updates under a file lock; when it goes over max_bytes the directory is scanned and the least recently
+    # used entries are removed. Hits, misses and evictions count what this object did, see add_counts
+    directory: Path
+    max_bytes: int
+
+    # hard-link hits to the output path instead of copying them: no copy, but the output is a read-only file
+    # sharing its inode with the entry
+    hard_links: bool
+
+    hits: int
+    misses: int
+    evictions: int
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int = DEFAULT_MAX_BYTES, hard_links: bool = False):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hard_links = hard_links
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self.__lock = threading.RLock()
+
+    def path(self, key: str, suffix: str) -> Path:
+        return self.directory / key[:2] / f'{key}{suffix}'
+
+    def get(self, key: str, suffix: str) -> Optional[Path]:
+        # another process may evict the entry before the path is opened, read and export don't have that gap
+        path = self.path(key, suffix)
+
+        try:
+            # the modification time is the last use eviction goes by
+            os.utime(path)
+        except FileNotFoundError:
+            self.__count(False)
+            return None
+
+        self.__count(True)
+
+        return path
+
+    def read(self, key: str, suffix: str) -> Optional[bytes]:
+        path = self.path(key, suffix)
+
+        try:
+            os.utime(path)
+            data = path.read_bytes()
+        except FileNotFoundError:
+            self.__count(False)
+            return None
+
+        self.__count(True)
+
+        return data
+
+    def export(self, key: str, suffix: str, fp: Union[str, bytes, Path]) -> bool:
+        # the entry copied (or linked) to fp; False is a miss, also when the entry was evicted meanwhile
+        path = self.path(key, suffix)
+        fp = os.fsdecode(fp)
+
+        try:
+            os.utime(path)
+            self.__replace(fp)
+
+            if not (self.hard_links and self.__link(path, fp)):
+                # a new file with the usual permissions, not the entry's read-only ones
+                shutil.copyfile(path, fp)
+        except FileNotFoundError:
+            if not os.path.exists(path):
+                self.__count(False)
+                return False
+            raise
+
+        self.__count(True)
+
+        return True
+
+    def write(self, fp: Union[str, bytes, Path], data: bytes, entry: Optional[Path] = None):
+        # what export does, for data in hand: the entry just put is linked if it still exists, otherwise the
+        # data is written
+        fp = os.fsdecode(fp)
+        self.__replace(fp)
+
+        if self.hard_links and entry is not None:
+            try:
+                if self.__link(entry, fp):
+                    return
+            except FileNotFoundError:
+                pass
+
+        with open(fp, 'wb') as f:
+            f.write(data)
+
+    @staticmethod
+    def __replace(fp: str):
+        # replace rather than overwrite, the old file may be a link to an entry
+        if os.path.lexists(fp):
+            os.unlink(fp)
+
+    @staticmethod
+    def __link(path: Path, fp: str) -> bool:
+        try:
+            os.link(path, fp)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            return False
+
+        return True
+
+    def __count(self, hit: bool):
+        with self.__lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, key: str, suffix: str, data: bytes) -> Path:
+        path = self.path(key, suffix)
+        path.parent.mkdir(exist_ok=True)
+
+        # write aside and rename, concurrent readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            # entries may be hard-linked into place, keep them from being truncated through a link
+            os.chmod(tmp, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+            with self.__locked():
+                try:
+                    replaced = path.stat().st_size
+                except FileNotFoundError:
+                    replaced = 0
+
+                # before the rename, a size rebuilt by scanning the directory must not count the new entry
+                total = self.__read_size() + len(data) - replaced
+                os.replace(tmp, path)
+
+                if total > self.max_bytes:
+                    total = self.__evict(keep=path)
+                self.__write_size(total)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+        return path
+
+    @contextmanager
+    def __locked(self):
+        # the thread lock for this process, the file lock for every other one sharing the directory
+        with self.__lock, open(self.directory / '.lock', 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def __scan(self) -> List[Tuple[float, int, str]]:
+        # (last use, size, path) of every entry on disk, whoever wrote it
+        entries = []
+
+        for directory in os.scandir(self.directory):
+            if not directory.is_dir() or directory.name.startswith('.'):
+                continue
+
+            for entry in os.scandir(directory.path):
+                if entry.name.startswith('.'):
+                    continue
+
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+
+                if stat.S_ISREG(st.st_mode):
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+
+        return entries
+
+    def __read_size(self) -> int:
+        try:
+            return int((self.directory / '.size').read_text())
+        except (FileNotFoundError, ValueError):
+            # a new directory, or one written before the size was kept
+            return sum(size for _, size, _ in self.__scan())
+
+    def __write_size(self, total: int):
+        (self.directory / '.size').write_text(str(total))
+
+    def __evict(self, keep: Path) -> int:
+        entries = self.__scan()
+        total = sum(size for _, size, _ in entries)
+
+        # least recently used first, never the entry that was just written
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes * EVICT_TO:
+                break
+
+            if path == str(keep):
+                continue
+
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            else:
+                self.evictions += 1
+
+            total -= size
+
+        return total
+
+    @property
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.__scan())
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+
+        return self.hits / total if total else 0.0
+
+    def counts(self) -> Tuple[int, int, int]:
+        with self.__lock:
+            return self.hits, self.misses, self.evictions
+
+    def add_counts(self, hits: int, misses: int, evictions: int):
+        # what a worker process did with its copy of this cache
+        with self.__lock:
+            self.hits += hits
+            self.misses += misses
+            self.evictions += evictions
+
+    def stats(self) -> dict:
+        entries = self.__scan()
+
+        with self.__lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hit_rate,
+                'evictions': self.evictions,
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes,
+            }
+
+    def clear(self):
+        with self.__locked():
+            for _, _, path in self.__scan():
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+
+            self.__write_size(0)
+
+    def __getstate__(self):
+        # handed to worker processes, each gets its own lock
+        state = self.__dict__.copy()
+        del state['_RenderCache__lock']
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock = threading.RLock()
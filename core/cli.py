@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, TextIO, Dict, Optional, Tuple, Union
+
+from core import batch
+from core.cache import RenderCache
+from core.encoding import EncoderOptions
+from core.main import BannerGenerator
+from core.template import load_template
+
+# Defaults fit records shaped like the test datasets: name, japanese_synonyms (a JSON-encoded list), score
+DEFAULT_MAPPING = {
+    'header': '{name}',
+    'subheader': '{japanese_synonyms[0]}',
+    'main_text': '{score}',
+}
+REQUIRED_FIELDS = ('header', 'main_text')
+
+DEFAULT_NAME = '{index:06d}.jpg'
+
+
+def decode_record(record: dict) -> dict:
+    decoded = {}
+
+    for key, value in record.items():
+        if isinstance(value, str) and value[:1] in ('[', '{'):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        decoded[key] = value
+
+    return decoded
+
+
+def map_record(record: dict, mapping: Dict[str, str], index: int) -> dict:
+    values = dict(decode_record(record), index=index, n=index + 1)
+    fields = {}
+
+    for field, template in mapping.items():
+        try:
+            value = template.format_map(values)
+        except (KeyError, IndexError, TypeError):
+            if field in REQUIRED_FIELDS:
+                raise ValueError(f'cannot build {field} from {template!r}')
+            value = None
+
+        if value:
+            fields[field] = value
+
+    return fields
+
+
+def read_records(stream: TextIO) -> Iterator[Tuple[int, Union[dict, ValueError]]]:
+    # a line that isn't a JSON object comes as the error, to be reported like any other bad record
+    for index, line in enumerate(stream):
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            record = ValueError(f'bad JSON: {e}')
+        else:
+            if not isinstance(record, dict):
+                record = ValueError(f'expected a JSON object, got {type(record).__name__}')
+
+        yield index, record
+
+
+def read_manifest(path: Path) -> set:
+    done = set()
+
+    if not path.exists():
+        return done
+
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # the last line may be torn if the previous run crashed mid-write
+                continue
+
+            if entry.get('status') == 'ok' and os.path.exists(entry['output']):
+                done.add(entry['output'])
+
+    return done
+
+
+def output_name(template: str, record: dict, index: int) -> str:
+    try:
+        return template.format_map(dict(decode_record(record), index=index, n=index + 1))
+    except (KeyError, IndexError, TypeError, ValueError, AttributeError):
+        raise ValueError(f'cannot build the file name from {template!r}')
+
+
+def render_timed(task: dict, generator: Optional[BannerGenerator] = None) -> dict:
+    result = {'index': task['index'], 'output': task['fp']}
+    started = time.perf_counter()
+
+    try:
+        if 'error' in task:
+            raise ValueError(task['error'])
+
+        batch.render_file(task, generator)
+    except Exception as e:
+        result.update(status='error', error=f'{type(e).__name__}: {e}')
+    else:
+        result['status'] = 'ok'
+
+    result['seconds'] = round(time.perf_counter() - started, 6)
+
+    return result
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(prog='anime-embedded', description='Render banners for a stream of JSONL records')
+
+    ap.add_argument('input', nargs='?', default='-',
+                    help='JSONL file, "-" for stdin')
+    ap.add_argument('-c', '--config', required=True,
+                    help='Template JSON')
+    ap.add_argument('-o', '--output-dir', required=True,
+                    help='Directory for rendered banners')
+    ap.add_argument('-n', '--name', default=DEFAULT_NAME,
+                    help='Output file name template, fields of the record plus {index} and {n}')
+    ap.add_argument('-m', '--map', action='append', default=[], metavar='FIELD=TEMPLATE',
+                    help='Build header/subheader/main_text/small_text from a record, e.g. main_text="#{n} anime"')
+    ap.add_argument('--manifest',
+                    help='Manifest of finished records, defaults to OUTPUT_DIR/manifest.jsonl')
+    ap.add_argument('-w', '--workers', type=int,
+                    help='Render processes (or threads), defaults to the number of CPUs')
+    ap.add_argument('--threads', action='store_true',
+                    help='Render on threads sharing one copy of the fonts and images instead of processes')
+    ap.add_argument('-q', '--quality', type=int,
+                    help='JPEG/WebP quality')
+    ap.add_argument('--cache-dir',
+                    help='Reuse banners rendered by earlier runs from this directory')
+    ap.add_argument('--hard-links', action='store_true',
+                    help='Hard-link banners found in --cache-dir instead of copying them, they are then read-only')
+    ap.add_argument('--asset-cache',
+                    help='Keep logos and overlays decoded and resized in this directory between runs')
+
+    args = ap.parse_args(args)
+
+    mapping = dict(DEFAULT_MAPPING)
+    for item in args.map:
+        field, sep, template = item.partition('=')
+        if not sep or field not in batch.RECORD_FIELDS:
+            ap.error(f'bad --map {item!r}, expected one of {", ".join(batch.RECORD_FIELDS)}=TEMPLATE')
+        mapping[field] = template
+
+    # an extension the template fixes is checked before anything is rendered
+    suffix = Path(args.name).suffix
+    if '{' not in suffix and '}' not in suffix:
+        try:
+            options = EncoderOptions.for_extension(suffix)
+            if args.quality is not None:
+                EncoderOptions(options.format, quality=args.quality).check()
+        except ValueError as e:
+            ap.error(f'bad --name/--quality: {e}')
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest_path = Path(args.manifest) if args.manifest else output_dir / 'manifest.jsonl'
+    done = read_manifest(manifest_path)
+
+    config = load_template(args.config, args.asset_cache)
+    cache = RenderCache(args.cache_dir, hard_links=args.hard_links) if args.cache_dir else None
+    workers = args.workers or os.cpu_count() or 1
+
+    stats = {'ok': 0, 'error': 0, 'skipped': 0}
+    started = time.perf_counter()
+
+    stream = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+
+    def tasks() -> Iterator[dict]:
+        for index, record in read_records(stream):
+            try:
+                if isinstance(record, ValueError):
+                    raise record
+
+                output = str(output_dir / output_name(args.name, record, index))
+            except ValueError as e:
+                # nothing to render, it is reported through the manifest like a record that can't be mapped
+                yield {'index': index, 'fp': None, 'error': str(e)}
+                continue
+
+            if output in done:
+                stats['skipped'] += 1
+                continue
+
+            task = {'index': index, 'fp': output}
+
+            try:
+                task.update(map_record(record, mapping, index))
+
+                if args.quality is not None:
+                    # the extension may come from the record, it is only known here
+                    task['options'] = {'format': EncoderOptions.for_extension(Path(output).suffix).format,
+                                       'quality': args.quality}
+            except ValueError as e:
+                task['error'] = str(e)
+
+            yield task
+
+    generator = batch.make_generator(config, cache) if args.threads else None
+
+    try:
+        with batch.make_executor(config, cache, workers, args.threads) as executor, \
+                open(manifest_path, 'a', encoding='utf-8') as manifest:
+            # tasks are read lazily and at most 2 per worker are in flight, memory stays flat on any input size
+            for _, result in batch.imap_bounded(executor, batch.bind(render_timed, generator), tasks(),
+                                                window=workers * 2, ordered=False):
+                stats[result['status']] += 1
+
+                manifest.write(json.dumps(result, ensure_ascii=False) + '\n')
+                manifest.flush()
+
+                if result['status'] != 'ok':
+                    print(f'#{result["index"]}: {result["error"]}', file=sys.stderr)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    elapsed = time.perf_counter() - started
+    rendered = stats['ok'] + stats['error']
+
+    print(f'{stats["ok"]} rendered, {stats["error"]} failed, {stats["skipped"]} skipped in {elapsed:.1f}s'
+          f' ({rendered / elapsed if elapsed else 0:.1f} banners/s)', file=sys.stderr)
+
+    return 1 if stats['error'] else 0
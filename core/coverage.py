@@ -0,0 +1,207 @@
+import os
+import struct
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+from PIL import ImageFont
+
+COVERAGE_CACHE_SIZE = 64
+
+# code points that belong to whatever run they are in instead of choosing a font of their own
+_JOINING = ('Zs', 'Cc', 'Cf', 'Mn', 'Me')
+
+# cmap subtables that map Unicode: (platform, encoding)
+_UNICODE = {(0, 0), (0, 1), (0, 2), (0, 3), (0, 4), (0, 6), (3, 1), (3, 10)}
+
+
+class Coverage:
+    # The code points a font has glyphs for, read from its cmap table into a bitmap: one bit per code point
+    # up to the highest mapped one, a lookup is a shift and a mask
+    path: str
+    bits: bytearray
+
+    def __init__(self, path: str, bits: bytearray):
+        self.path = path
+        self.bits = bits
+
+    def __contains__(self, codepoint: int) -> bool:
+        index = codepoint >> 3
+
+        return index < len(self.bits) and bool(self.bits[index] & (1 << (codepoint & 7)))
+
+    def covers(self, text: str) -> bool:
+        return all(ord(char) in self or unicodedata.category(char) in _JOINING for char in text)
+
+    def __len__(self):
+        return sum(bin(byte).count('1') for byte in self.bits)
+
+    def __repr__(self):
+        return f'Coverage({self.path!r}, {len(self)} code points)'
+
+
+def _set(bits: bytearray, codepoint: int):
+    index = codepoint >> 3
+    if index >= len(bits):
+        bits.extend(bytes(index + 1 - len(bits)))
+
+    bits[index] |= 1 << (codepoint & 7)
+
+
+def _read_subtable(data: bytes, offset: int, bits: bytearray):
+    fmt, = struct.unpack_from('>H', data, offset)
+
+    if fmt == 0:
+        for codepoint, glyph in enumerate(data[offset + 6:offset + 6 + 256]):
+            if glyph:
+                _set(bits, codepoint)
+
+    elif fmt == 4:
+        segments = struct.unpack_from('>H', data, offset + 6)[0] // 2
+        ends = offset + 14
+        starts = ends + segments * 2 + 2
+        deltas = starts + segments * 2
+        range_offsets = deltas + segments * 2
+
+        for i in range(segments):
+            end, = struct.unpack_from('>H', data, ends + i * 2)
+            start, = struct.unpack_from('>H', data, starts + i * 2)
+            delta, = struct.unpack_from('>h', data, deltas + i * 2)
+            range_offset, = struct.unpack_from('>H', data, range_offsets + i * 2)
+
+            if start == 0xFFFF:
+                continue
+
+            for codepoint in range(start, end + 1):
+                if range_offset == 0:
+                    glyph = (codepoint + delta) & 0xFFFF
+                else:
+                    # idRangeOffset counts from its own position in the array
+                    glyph, = struct.unpack_from('>H', data, range_offsets + i * 2 + range_offset
+                                                + (codepoint - start) * 2)
+                    if glyph:
+                        glyph = (glyph + delta) & 0xFFFF
+
+                if glyph:
+                    _set(bits, codepoint)
+
+    elif fmt == 6:
+        first, count = struct.unpack_from('>HH', data, offset + 6)
+        glyphs = struct.unpack_from(f'>{count}H', data, offset + 10)
+
+        for codepoint, glyph in enumerate(glyphs, first):
+            if glyph:
+                _set(bits, codepoint)
+
+    elif fmt in (12, 13):
+        groups, = struct.unpack_from('>I', data, offset + 12)
+
+        for i in range(groups):
+            start, end, glyph = struct.unpack_from('>III', data, offset + 16 + i * 12)
+
+            for codepoint in range(start, min(end, 0x10FFFF) + 1):
+                # format 12 counts glyphs up from the first one, format 13 maps the whole range to it
+                if glyph + (codepoint - start if fmt == 12 else 0):
+                    _set(bits, codepoint)
+
+
+def read_cmap(path: Union[str, Path], index: int = 0) -> bytearray:
+    # the union of the font's Unicode cmap subtables; index picks the font of a .ttc collection
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    base = 0
+    if data[:4] == b'ttcf':
+        base, = struct.unpack_from('>I', data, 12 + index * 4)
+
+    tables, = struct.unpack_from('>H', data, base + 4)
+    cmap = None
+
+    for i in range(tables):
+        tag, _, offset, _ = struct.unpack_from('>4sIII', data, base + 12 + i * 16)
+        if tag == b'cmap':
+            cmap = offset
+            break
+
+    if cmap is None:
+        raise ValueError(f'{path} has no cmap table')
+
+    bits = bytearray()
+    count, = struct.unpack_from('>H', data, cmap + 2)
+
+    for i in range(count):
+        platform, encoding, offset = struct.unpack_from('>HHI', data, cmap + 4 + i * 8)
+
+        if (platform, encoding) in _UNICODE:
+            _read_subtable(data, cmap + offset, bits)
+
+    return bits
+
+
+@lru_cache(maxsize=COVERAGE_CACHE_SIZE)
+def _coverage(path: str, mtime_ns: int, size: int) -> Coverage:
+    return Coverage(path, read_cmap(path))
+
+
+def coverage(path: Union[str, Path]) -> Coverage:
+    st = os.stat(path)
+
+    return _coverage(os.fspath(path), st.st_mtime_ns, st.st_size)
+
+
+def split_runs(text: str, fonts: Sequence[ImageFont.FreeTypeFont],
+               coverages: Optional[Sequence[Coverage]] = None) -> List[Tuple[str, ImageFont.FreeTypeFont]]:
+    # Consecutive characters drawn with the same font, each taking the first font of the chain that has
+    # it. Spaces, controls and combining marks stay in the run they are in. A character no font has is
+    # left out, it would only be drawn as a missing-glyph box. Pass the fonts' coverages when splitting
+    # many texts along one chain, looking them up stats every font file
+    if coverages is None:
+        coverages = [coverage(font.path) for font in fonts]
+
+    runs = []
+    current = None
+    chars = []
+
+    for char in text:
+        if unicodedata.category(char) in _JOINING:
+            font = current if current is not None else fonts[0]
+        else:
+            codepoint = ord(char)
+            font = next((font for font, covered in zip(fonts, coverages) if codepoint in covered), None)
+
+            if font is None:
+                continue
+
+        if font is not current and chars:
+            runs.append((''.join(chars), current))
+            chars = []
+
+        current = font
+        chars.append(char)
+
+    if chars:
+        runs.append((''.join(chars), current))
+
+    return runs
+
+
+def positioned_runs(text: str, position: Tuple[float, float], fonts: Sequence[ImageFont.FreeTypeFont],
+                    coverages: Optional[Sequence[Coverage]] = None
+                    ) -> List[Tuple[Tuple[float, float], str, ImageFont.FreeTypeFont]]:
+    # Runs placed one after the other on the first font's baseline: text is drawn from the top of its
+    # font's ascent, so a font with another ascent is moved by the difference
+    x, y = position
+    ascent = fonts[0].getmetrics()[0]
+
+    placed = []
+    for text, font in split_runs(text, fonts, coverages):
+        placed.append(((x, y + ascent - font.getmetrics()[0]), text, font))
+        x += font.getlength(text)
+
+    return placed
+
+
+def runs_width(text: str, fonts: Sequence[ImageFont.FreeTypeFont],
+               coverages: Optional[Sequence[Coverage]] = None) -> float:
+    return sum(font.getlength(text) for text, font in split_runs(text, fonts, coverages))
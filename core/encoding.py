@@ -0,0 +1,140 @@
+import io
+from typing import Optional, Union, Set
+
+from PIL import Image
+from PIL.Image import Image as ImageType
+
+# Which EncoderOptions fields each Pillow encoder understands, anything else is left out of save()
+FORMAT_OPTIONS = {
+    'JPEG': ('quality', 'progressive', 'optimize', 'subsampling'),
+    'PNG': ('optimize', 'compress_level'),
+    'WEBP': ('quality', 'lossless', 'method'),
+    'AVIF': ('quality', 'speed', 'subsampling'),
+}
+
+FORMAT_ALIASES = {
+    'JPG': 'JPEG',
+}
+
+EXTENSIONS = {
+    'JPEG': '.jpg',
+}
+
+# Values the encoders accept, checked up front: a bad one would only fail inside save(), in a worker
+OPTION_RANGES = {
+    'quality': (0, 100),
+    'method': (0, 6),
+    'compress_level': (0, 9),
+    'speed': (0, 10),
+}
+BOOLEAN_OPTIONS = ('progressive', 'optimize', 'lossless')
+SUBSAMPLING = (-1, 0, 1, 2, '4:4:4', '4:2:2', '4:2:0', '4:0:0', 'keep')
+
+
+def available_formats() -> Set[str]:
+    # AVIF only shows up when a plugin such as pillow-avif-plugin has been imported
+    Image.init()
+
+    return set(Image.SAVE)
+
+
+class EncoderOptions:
+    format: str
+
+    quality: Optional[int]
+    progressive: Optional[bool]
+    optimize: Optional[bool]
+    subsampling: Optional[Union[int, str]]
+    lossless: Optional[bool]
+    method: Optional[int]
+    compress_level: Optional[int]
+    speed: Optional[int]
+
+    def __init__(
+        self,
+        format: str = 'JPEG',
+        quality: Optional[int] = None,
+        progressive: Optional[bool] = None,
+        optimize: Optional[bool] = None,
+        subsampling: Optional[Union[int, str]] = None,
+        lossless: Optional[bool] = None,
+        method: Optional[int] = None,
+        compress_level: Optional[int] = None,
+        speed: Optional[int] = None
+    ):
+        self.format = FORMAT_ALIASES.get(format.upper(), format.upper())
+
+        self.quality = quality
+        self.progressive = progressive
+        self.optimize = optimize
+        self.subsampling = subsampling
+        self.lossless = lossless
+        self.method = method
+        self.compress_level = compress_level
+        self.speed = speed
+
+    @classmethod
+    def for_extension(cls, suffix: str) -> 'EncoderOptions':
+        fmt = Image.registered_extensions().get(suffix.lower())
+        if fmt is None:
+            raise ValueError(f'unknown file extension: {suffix}')
+
+        return cls(format=fmt)
+
+    @property
+    def extension(self) -> str:
+        if self.format in EXTENSIONS:
+            return EXTENSIONS[self.format]
+
+        extensions = [ext for ext, fmt in Image.registered_extensions().items() if fmt == self.format]
+        preferred = f'.{self.format.lower()}'
+
+        return preferred if preferred in extensions else (extensions[0] if extensions else preferred)
+
+    def save_kwargs(self) -> dict:
+        # unset fields fall back to Pillow's defaults
+        names = FORMAT_OPTIONS.get(self.format, ())
+
+        return {name: getattr(self, name) for name in names if getattr(self, name) is not None}
+
+    def check(self):
+        if self.format not in available_formats():
+            raise ValueError(f'{self.format} encoding is not available in this Pillow build')
+
+        for name, (low, high) in OPTION_RANGES.items():
+            value = getattr(self, name)
+
+            if value is not None and (type(value) is not int or not low <= value <= high):
+                raise ValueError(f'{name} must be an integer from {low} to {high}, got {value!r}')
+
+        for name in BOOLEAN_OPTIONS:
+            value = getattr(self, name)
+
+            if value is not None and not isinstance(value, bool):
+                raise ValueError(f'{name} must be true or false, got {value!r}')
+
+        if self.subsampling is not None and (isinstance(self.subsampling, bool)
+                                             or self.subsampling not in SUBSAMPLING):
+            raise ValueError(f'subsampling must be one of {", ".join(map(str, SUBSAMPLING))}, '
+                             f'got {self.subsampling!r}')
+
+
+def encode_into(image: ImageType, buffer: io.BytesIO, options: EncoderOptions) -> memoryview:
+    options.check()
+
+    if options.format == 'JPEG' and image.mode not in ('RGB', 'L', 'CMYK'):
+        image = image.convert('RGB')
+
+    start = buffer.tell()
+    image.save(buffer, options.format, **options.save_kwargs())
+    end = buffer.tell()
+
+    # the view pins the buffer: a BytesIO can't be resized while it is alive
+    return buffer.getbuffer()[start:end]
+
+
+def encode(image: ImageType, options: EncoderOptions) -> bytes:
+    buffer = io.BytesIO()
+    encode_into(image, buffer, options)
+
+    return buffer.getvalue()
@@ -0,0 +1,216 @@
+from typing import List, Optional, Tuple
+
+from PIL import ImageDraw
+from PIL.Image import Image as ImageType
+
+from core.layout import LayoutPlan, TextItem
+from core.main import BannerGenerator, UNDERLINE_WIDTH
+from core.text import draw_text, text_box
+
+Box = Tuple[int, int, int, int]
+
+
+class _Op:
+    # one drawing step of a render: a text, the underline or the sub_image, with the pixels it may touch
+    kind: str
+    value: object
+    box: Box
+    anchor: Tuple[int, int]
+
+    def __init__(self, kind: str, value, box: Box, anchor: Tuple[int, int]):
+        self.kind = kind
+        self.value = value
+        self.box = box
+        self.anchor = anchor
+
+    def key(self):
+        if self.kind == 'text':
+            return self.kind, self.value.to_dict()
+
+        return self.kind, self.value
+
+
+def _intersects(a: Box, b: Box) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _union(a: Box, b: Box) -> Box:
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+class IncrementalRenderer:
+    # Keeps the last render of a generator and its plan. The next call lays the banner out again and only
+    # redraws the blocks whose content or position changed: their old and new areas are restored from the
+    # static base and everything overlapping them is drawn again, clipped and in the usual order, so the
+    # result is the same image a full render would produce.
+    # The returned image is updated in place by the next call, copy it to keep it
+    generator: BannerGenerator
+
+    image: Optional[ImageType]
+    plan: Optional[LayoutPlan]
+
+    # areas redrawn by the last call, None when it was a full render
+    regions: Optional[List[Box]]
+
+    def __init__(self, generator: BannerGenerator):
+        self.generator = generator
+
+        self.image = None
+        self.plan = None
+        self.regions = None
+
+        self.__base = None
+        self.__sub_image = None
+        self.__blocks = None
+
+    def render(self, header: str, main_text: str, subheader: Optional[str] = None,
+               small_text: Optional[str] = None) -> ImageType:
+        generator = self.generator
+        plan = generator._timed('layout', generator.layout, header, main_text, subheader, small_text)
+
+        return generator._timed('render', self.render_plan, plan)
+
+    def render_plan(self, plan: LayoutPlan) -> ImageType:
+        base = self.generator._static_layers()
+        sub_image = self.generator.config.sub_image
+        blocks = self.__ops(base, plan)
+
+        if (self.image is None or base is not self.__base or sub_image is not self.__sub_image
+                or plan.size != self.plan.size or plan.color != self.plan.color):
+            self.image = self.generator.render(plan)
+            self.regions = None
+        else:
+            regions = self.__dirty(self.__blocks, blocks, plan.size)
+            if regions is None:
+                self.image = self.generator.render(plan)
+            else:
+                ops = [op for block in blocks.values() for op in block]
+                for region in regions:
+                    self.__redraw(base, region, ops, plan.color)
+
+            self.regions = regions
+
+        self.plan = plan
+        self.__base = base
+        self.__sub_image = sub_image
+        self.__blocks = blocks
+
+        return self.image
+
+    def reset(self):
+        self.image = None
+        self.plan = None
+        self.regions = None
+
+    def __ops(self, base: ImageType, plan: LayoutPlan) -> dict:
+        # in drawing order, see BannerGenerator.render
+        def text(item: Optional[TextItem]) -> List[_Op]:
+            if item is None:
+                return []
+
+            box = anchor = None
+            for position, run, font in self.generator._runs(item):
+                x, y = int(position[0]), int(position[1])
+                run_box = text_box(draw, position, run, plan.color, font)
+
+                box = run_box if box is None else _union(box, run_box)
+                anchor = (x, y) if anchor is None else (min(anchor[0], x), min(anchor[1], y))
+
+            return [] if box is None else [_Op('text', item, box, anchor)]
+
+        draw = ImageDraw.Draw(base)
+
+        subheader = text(plan.subheader)
+        if plan.underline is not None:
+            (x1, y1), (x2, y2) = plan.underline
+            width = self.generator.config.px(UNDERLINE_WIDTH)
+            box = (int(min(x1, x2)) - width, int(min(y1, y2)) - width,
+                   int(max(x1, x2)) + width + 1, int(max(y1, y2)) + width + 1)
+
+            # the line's polygon is rounded from its shifted corners as well, keep all of it inside
+            subheader.append(_Op('line', plan.underline, box, box[:2]))
+
+        sub_image = []
+        if plan.sub_image is not None:
+            image = self.generator.config.sub_image
+            x, y = int(plan.sub_image[0]), int(plan.sub_image[1])
+            sub_image.append(_Op('paste', (x, y), (x, y, x + image.width, y + image.height), (x, y)))
+
+        return {
+            'header': [op for item in plan.header for op in text(item)],
+            'subheader': subheader,
+            'small_text': text(plan.small_text),
+            'main_text': [op for item in plan.main_text for op in text(item)],
+            'sub_image': sub_image,
+        }
+
+    @staticmethod
+    def __dirty(previous: dict, current: dict, size: Tuple[int, int]) -> Optional[List[Box]]:
+        ops = [op for block in current.values() for op in block]
+        regions = []
+
+        for name, block in current.items():
+            if [op.key() for op in block] == [op.key() for op in previous[name]]:
+                continue
+
+            for op in previous[name] + block:
+                regions.append(op.box)
+
+        # An item drawn into a region is shifted by the region's corner. Pillow truncates the shifted
+        # position, so a region must not start right of or below an item it draws; grow it to the item's
+        # position and merge overlapping regions until nothing changes
+        changed = True
+        while changed:
+            changed = False
+
+            for i, region in enumerate(regions):
+                for op in ops:
+                    if _intersects(op.box, region) and (op.anchor[0] < region[0] or op.anchor[1] < region[1]):
+                        region = regions[i] = (min(region[0], op.anchor[0]), min(region[1], op.anchor[1]),
+                                               region[2], region[3])
+                        changed = True
+
+            merged = []
+            for region in regions:
+                for j, other in enumerate(merged):
+                    if _intersects(region, other):
+                        merged[j] = _union(region, other)
+                        changed = True
+                        break
+                else:
+                    merged.append(region)
+            regions = merged
+
+        width, height = size
+        clipped = []
+
+        for left, top, right, bottom in regions:
+            if left < 0 or top < 0:
+                # an item starts outside the canvas, a full render is simpler than shifting it
+                return None
+
+            if left < width and top < height:
+                clipped.append((left, top, min(right, width), min(bottom, height)))
+
+        return clipped
+
+    def __redraw(self, base: ImageType, region: Box, ops: List[_Op], color: str):
+        left, top = region[:2]
+        canvas = base.crop(region)
+        draw = ImageDraw.Draw(canvas)
+
+        for op in ops:
+            if not _intersects(op.box, region):
+                continue
+
+            if op.kind == 'text':
+                for (x, y), run, font in self.generator._runs(op.value):
+                    draw_text(draw, (x - left, y - top), run, color, font)
+            elif op.kind == 'line':
+                draw.line([(x - left, y - top) for x, y in op.value], fill=color,
+                          width=self.generator.config.px(UNDERLINE_WIDTH))
+            else:
+                sub_image = self.generator.config.sub_image
+                canvas.paste(sub_image, (op.value[0] - left, op.value[1] - top), sub_image)
+
+        self.image.paste(canvas, (left, top))
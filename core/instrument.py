@@ -0,0 +1,65 @@
+import threading
+from collections import defaultdict
+from typing import Dict
+
+
+class Instrument:
+    # Subclass and override either method to feed timings into a metrics stack.
+    # Span names: layout, render, encode, fit, wrap, draw, composite, static
+    def span(self, name: str, seconds: float):
+        pass
+
+    def count(self, name: str, value: int = 1):
+        pass
+
+
+class Recorder(Instrument):
+    totals: Dict[str, float]
+    calls: Dict[str, int]
+    slowest: Dict[str, float]
+    counters: Dict[str, int]
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.slowest = defaultdict(float)
+        self.counters = defaultdict(int)
+
+        # a generator shared between threads reports from all of them
+        self.__lock = threading.Lock()
+
+    def span(self, name: str, seconds: float):
+        with self.__lock:
+            self.totals[name] += seconds
+            self.calls[name] += 1
+
+            if seconds > self.slowest[name]:
+                self.slowest[name] = seconds
+
+    def count(self, name: str, value: int = 1):
+        with self.__lock:
+            self.counters[name] += value
+
+    def reset(self):
+        with self.__lock:
+            self.totals.clear()
+            self.calls.clear()
+            self.slowest.clear()
+            self.counters.clear()
+
+    def to_dict(self) -> dict:
+        with self.__lock:
+            return self.__to_dict()
+
+    def __to_dict(self) -> dict:
+        return {
+            'spans': {
+                name: {
+                    'calls': self.calls[name],
+                    'total_ms': round(total * 1000, 3),
+                    'max_ms': round(self.slowest[name] * 1000, 3),
+                }
+                for name, total in self.totals.items()
+            },
+            'counters': dict(self.counters),
+        }
@@ -0,0 +1,146 @@
+import json
+from typing import Optional, Tuple, List
+
+from PIL import ImageFont
+
+from core.utils import load_font
+
+Point = Tuple[float, float]
+
+
+class TextItem:
+    text: str
+    position: Point
+    font_path: str
+    font_size: int
+
+    def __init__(self, text: str, position: Point, font_path: str, font_size: int):
+        self.text = text
+        self.position = tuple(position)
+        self.font_path = font_path
+        self.font_size = font_size
+
+    @classmethod
+    def of(cls, text: str, position: Point, font: ImageFont) -> 'TextItem':
+        return cls(text, position, font.path, font.size)
+
+    @property
+    def font(self) -> ImageFont:
+        return load_font(self.font_path, self.font_size)
+
+    def to_dict(self) -> dict:
+        return {
+            'text': self.text,
+            'position': list(self.position),
+            'font_path': self.font_path,
+            'font_size': self.font_size,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'TextItem':
+        return cls(data['text'], data['position'], data['font_path'], data['font_size'])
+
+    def __eq__(self, other):
+        return isinstance(other, TextItem) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f'TextItem({self.text!r}, {self.position!r}, {self.font_path!r}, {self.font_size!r})'
+
+
+def _item(data: Optional[dict]) -> Optional[TextItem]:
+    return None if data is None else TextItem.from_dict(data)
+
+
+def _point(data: Optional[list]) -> Optional[Point]:
+    return None if data is None else tuple(data)
+
+
+class LayoutPlan:
+    size: Tuple[int, int]
+    color: str
+
+    header: List[TextItem]
+    subheader: Optional[TextItem]
+    underline: Optional[Tuple[Point, Point]]
+    small_text: Optional[TextItem]
+    main_text: List[TextItem]
+
+    sub_image_fits: bool
+    sub_image: Optional[Point]
+
+    logo: Optional[Point]
+    site: Optional[TextItem]
+
+    correctors: dict
+
+    def __init__(
+        self,
+        size: Tuple[int, int],
+        color: str,
+        header: List[TextItem],
+        main_text: List[TextItem],
+        subheader: Optional[TextItem] = None,
+        underline: Optional[Tuple[Point, Point]] = None,
+        small_text: Optional[TextItem] = None,
+        sub_image: Optional[Point] = None,
+        logo: Optional[Point] = None,
+        site: Optional[TextItem] = None,
+        correctors: Optional[dict] = None
+    ):
+        self.size = tuple(size)
+        self.color = color
+
+        self.header = header
+        self.subheader = subheader
+        self.underline = None if underline is None else (tuple(underline[0]), tuple(underline[1]))
+        self.small_text = small_text
+        self.main_text = main_text
+
+        self.sub_image = _point(sub_image)
+        self.sub_image_fits = sub_image is not None
+
+        self.logo = _point(logo)
+        self.site = site
+
+        self.correctors = correctors or {}
+
+    def to_dict(self) -> dict:
+        return {
+            'size': list(self.size),
+            'color': self.color,
+            'header': [item.to_dict() for item in self.header],
+            'subheader': None if self.subheader is None else self.subheader.to_dict(),
+            'underline': None if self.underline is None else [list(point) for point in self.underline],
+            'small_text': None if self.small_text is None else self.small_text.to_dict(),
+            'main_text': [item.to_dict() for item in self.main_text],
+            'sub_image': None if self.sub_image is None else list(self.sub_image),
+            'logo': None if self.logo is None else list(self.logo),
+            'site': None if self.site is None else self.site.to_dict(),
+            'correctors': dict(self.correctors),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LayoutPlan':
+        return cls(
+            size=data['size'],
+            color=data['color'],
+            header=[TextItem.from_dict(item) for item in data['header']],
+            main_text=[TextItem.from_dict(item) for item in data['main_text']],
+            subheader=_item(data.get('subheader')),
+            underline=data.get('underline'),
+            small_text=_item(data.get('small_text')),
+            sub_image=data.get('sub_image'),
+            logo=data.get('logo'),
+            site=_item(data.get('site')),
+            correctors=data.get('correctors'),
+        )
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, data: str) -> 'LayoutPlan':
+        return cls.from_dict(json.loads(data))
+
+    def __eq__(self, other):
+        return isinstance(other, LayoutPlan) and self.to_dict() == other.to_dict()
@@ -0,0 +1,103 @@
+import re
+from textwrap import TextWrapper
+from typing import List, Optional, Sequence
+
+from PIL import ImageFont
+
+from core.measure import get_measurer, TextMeasurer
+
+# Kana, CJK ideographs and punctuation, fullwidth forms and Hangul can break between any two characters
+cjk_re = re.compile(r'([\u2e80-\u2fff\u3000-\u30ff\u3100-\u31ff\u3400-\u4dbf\u4e00-\u9fff'
+                    r'\uac00-\ud7af\uf900-\ufaff\ufe30-\ufe4f\uff00-\uffef])')
+whitespace_re = re.compile(r'[\t\n\x0b\x0c\r]')
+
+
+def split_chunks(text: str) -> List[str]:
+    # Same word/whitespace/hyphen chunks as textwrap, with CJK runs split into single characters
+    text = whitespace_re.sub(' ', text.expandtabs())
+
+    chunks = []
+    for chunk in TextWrapper.wordsep_re.split(text):
+        if cjk_re.search(chunk) is not None:
+            chunks.extend(part for part in cjk_re.split(chunk) if part)
+        elif chunk:
+            chunks.append(chunk)
+
+    return chunks
+
+
+def _chunk_width(measurer: TextMeasurer, chunk: str) -> float:
+    if chunk.isspace():
+        return measurer.advance(' ') * len(chunk)
+
+    return measurer.advance(chunk)
+
+
+def break_lines(text: str, max_width: float, font: ImageFont, count: Optional[int] = None,
+                exact: bool = False, fallbacks: Optional[Sequence[ImageFont.FreeTypeFont]] = None) -> List[str]:
+    # fallbacks: the fonts drawing what font has no glyphs for, see Config.font_chain
+    measurer = get_measurer(font, fallbacks)
+
+    def measure(line: List[str], width: float, chunk: str) -> float:
+        if exact:
+            return measurer.width(''.join(line) + chunk, exact=True)
+
+        return width + _chunk_width(measurer, chunk)
+
+    def fits(length: int, width: float) -> bool:
+        return (count is None or length <= count) and width < max_width
+
+    chunks = split_chunks(text)
+    chunks.reverse()
+
+    lines = []
+
+    while chunks:
+        line = []
+        length = 0
+        width = 0.0
+
+        if lines and chunks[-1].isspace():
+            chunks.pop()
+
+        while chunks:
+            chunk = chunks[-1]
+            line_width = measure(line, width, chunk)
+
+            if not fits(length + len(chunk), line_width):
+                break
+
+            line.append(chunks.pop())
+            length += len(chunk)
+            width = line_width
+
+        if chunks and not fits(len(chunks[-1]), measure([], 0.0, chunks[-1])):
+            # a chunk wider than a whole line: fill the rest of this one character by character
+            chunk = chunks[-1]
+            end = 0
+
+            while end < len(chunk):
+                char_width = measure(line + [chunk[:end]], width, chunk[end])
+
+                if not fits(length + 1, char_width) and (line or end > 0):
+                    break
+
+                length += 1
+                width = char_width
+                end += 1
+
+            if end > 0:
+                line.append(chunk[:end])
+
+                if end < len(chunk):
+                    chunks[-1] = chunk[end:]
+                else:
+                    chunks.pop()
+
+        if line and line[-1].isspace():
+            line.pop()
+
+        if line:
+            lines.append(''.join(line))
+
+    return lines
@@ -1,11 +1,30 @@
-from typing import Optional, Union, Tuple
+from typing import Optional, Union, Tuple, Iterable, Iterator, Any, List, Dict
 from colour import Color
 from PIL import ImageFont, Image, ImageDraw
 from PIL.Image import Image as ImageType
 from pathlib import Path
+import hashlib
+import io
+import math
+import json
+import os
 import re
-
-from core.utils import bruteforce, find_suitable_fontsize
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor
+from contextlib import contextmanager
+
+from core.cache import RenderCache, make_key
+from core.coverage import Coverage, coverage, positioned_runs, runs_width
+from core.encoding import EncoderOptions, encode, encode_into
+from core.instrument import Instrument
+from core.layout import LayoutPlan, Point, TextItem
+from core.pool import CanvasPool, DEFAULT_POOL_SIZE
+from core.variants import Variant, encode_variants
+from core.linebreak import break_lines
+from core.text import draw_text, mask_cache_info
+from core.utils import find_suitable_fontsize, load_font, file_digest, image_digest, image_size, reduce_to
 
 DEFAULT_MAX_TEXT_WIDTH = 500
 DEFAULT_MAX_HEADER_WIDTH = 730
@@ -25,9 +44,68 @@ DEFAULT_LENGTH = 40
 
 DEFAULT_FONT = 'arial.ttf'
 
+UNDERLINE_WIDTH = 3
+
 ru_re = re.compile(r'^[а-яёА-ЯЁ\s]+$')
 
 
+class _Lazy(ABC):
+    # Non-data descriptor: the first read loads the resource and stores it on the instance, so later reads
+    # and plain assignment never come back here. Threads reading it first at the same time load it once
+    name: str
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, config: Optional['Config'], owner=None):
+        if config is None:
+            return self
+
+        with config._lock:
+            if self.name in config.__dict__:
+                return config.__dict__[self.name]
+
+            value = self.load(config, config._sources[self.name])
+            config.__dict__[self.name] = value
+
+        return value
+
+    @abstractmethod
+    def load(self, config: 'Config', source):
+        pass
+
+
+class _LazyFont(_Lazy):
+    size_attribute: str
+
+    def __init__(self, size_attribute: str):
+        self.size_attribute = size_attribute
+
+    def load(self, config: 'Config', source: str) -> ImageFont.FreeTypeFont:
+        return load_font(source, getattr(config, self.size_attribute))
+
+
+class _LazyImage(_Lazy):
+    def load(self, config: 'Config', source) -> Optional[ImageType]:
+        if source is None:
+            return None
+
+        if isinstance(source, ImageType):
+            image = source
+        elif callable(source):
+            image = source()
+        else:
+            image = Image.open(source)
+
+        if config.scale != 1:
+            image = reduce_to(image, (config.px(image.width), config.px(image.height)))
+
+        # decoded here, under the config's lock, rather than by whichever thread touches the pixels first
+        image.load()
+
+        return image
+
+
 class Config:
     max_text_width: int
     max_header_width: int
@@ -39,30 +117,47 @@ class Config:
     padding: int
     bottom_padding: int
 
+    # fonts and images load on first use, a render that never touches one never pays for it
     header_fontsize: int
-    header_font: ImageFont
+    header_font: ImageFont = _LazyFont('header_fontsize')
 
     subheader_fontsize: int
-    subheader_font: ImageFont
+    subheader_font: ImageFont = _LazyFont('subheader_fontsize')
 
     main_fontsize: int
-    main_font: ImageFont
+    main_font: ImageFont = _LazyFont('main_fontsize')
 
     text_fontsize: int
-    text_font: ImageFont
+    text_font: ImageFont = _LazyFont('text_fontsize')
 
     small_text_fontsize: int
-    small_text_font: ImageFont
+    small_text_font: ImageFont = _LazyFont('small_text_fontsize')
 
-    background: ImageType
+    background: ImageType = _LazyImage()
 
-    logo_first_part: Optional[ImageType]
-    logo_second_part: Optional[ImageType]
+    logo_first_part: Optional[ImageType] = _LazyImage()
+    logo_second_part: Optional[ImageType] = _LazyImage()
 
-    sub_image: Optional[ImageType]
+    sub_image: Optional[ImageType] = _LazyImage()
 
     site: str
 
+    exact_measure: bool
+
+    # Target width of the banner. The background is decoded at that size (JPEG draft mode, Image.reduce) and
+    # every image, font size and layout distance is scaled by the same factor; None keeps the background's
+    # own size
+    output_width: Optional[int]
+    scale: float
+
+    # Fonts tried, in order, for characters the font of a text has no glyph for, at that font's size. Text
+    # is then drawn in runs split by glyph coverage and characters no font has are left out; None draws
+    # every text with its own font alone
+    fallback_fonts: Optional[List[str]]
+
+    # set when the Config was built from a core.template.ConfigSpec
+    spec: Optional[Any]
+
     def __init__(
         self,
         max_text_width: int = DEFAULT_MAX_TEXT_WIDTH,
@@ -85,7 +180,10 @@ class Config:
         logo_second_part: str or Path or ImageType = None,
         sub_image: str or Path or ImageType = None,
         site: str = '',
-        length: int = DEFAULT_LENGTH
+        length: int = DEFAULT_LENGTH,
+        exact_measure: bool = False,
+        output_width: Optional[int] = None,
+        fallback_fonts: Optional[Iterable[str or Path]] = None
     ):
         self.max_text_width = max_text_width
         self.max_header_width = max_header_width
@@ -99,81 +197,146 @@ class Config:
         self.bottom_padding = bottom_padding
 
         self.header_fontsize = header_fontsize
+        self.subheader_fontsize = subheader_fontsize
+        self.main_fontsize = main_fontsize
+        self.text_fontsize = text_fontsize
+        self.small_text_fontsize = small_text_fontsize
 
-        if isinstance(header_font, Path):
-            header_font = str(header_font)
+        self.length = length
 
-        self.header_font = ImageFont.truetype(header_font, size=self.header_fontsize)
+        # an image source may also be a zero-argument callable producing the image, see core.template
+        self._sources = {
+            'header_font': header_font,
+            'subheader_font': subheader_font,
+            'main_font': main_font,
+            'text_font': text_font,
+            'small_text_font': small_text_font,
+            'background': background,
+            'logo_first_part': logo_first_part,
+            'logo_second_part': logo_second_part,
+            'sub_image': sub_image,
+        }
+
+        for name, source in self._sources.items():
+            if isinstance(source, Path):
+                self._sources[name] = str(source)
 
-        self.subheader_fontsize = subheader_fontsize
+        self.site = site
 
-        if isinstance(subheader_font, Path):
-            subheader_font = str(subheader_font)
+        self.exact_measure = exact_measure
 
-        self.subheader_font = ImageFont.truetype(subheader_font, size=self.subheader_fontsize)
+        self.fallback_fonts = None if fallback_fonts is None else [str(path) for path in fallback_fonts]
 
-        self.main_fontsize = main_fontsize
+        self.spec = None
 
-        if isinstance(main_font, Path):
-            main_font = str(main_font)
+        self._lock = threading.RLock()
 
-        self.main_font = ImageFont.truetype(main_font, size=self.main_fontsize)
+        self.output_width = output_width
+        self.scale = 1.0
 
-        self.text_fontsize = text_fontsize
+        if output_width is not None:
+            source = self._sources['background']
+            if callable(source):
+                source = self._sources['background'] = source()
 
-        if isinstance(text_font, Path):
-            text_font = str(text_font)
+            self.scale = output_width / image_size(source)[0]
 
-        self.text_font = ImageFont.truetype(text_font, size=self.text_fontsize)
+            for name in ('max_text_width', 'max_header_width', 'padding', 'bottom_padding', 'header_fontsize',
+                         'subheader_fontsize', 'main_fontsize', 'text_fontsize', 'small_text_fontsize'):
+                setattr(self, name, self.px(getattr(self, name)))
 
-        self.small_text_fontsize = small_text_fontsize
+        self.__fingerprint = None
+        self.__coverages: Dict[str, Coverage] = {}
 
-        if isinstance(small_text_font, Path):
-            small_text_font = str(small_text_font)
+    def px(self, value: int) -> int:
+        # a distance laid out for the background's own size, at the output size
+        if self.scale == 1:
+            return value
 
-        self.small_text_font = ImageFont.truetype(small_text_font, size=self.small_text_fontsize)
+        return max(1, round(value * self.scale))
 
-        self.length = length
+    def fingerprint(self) -> str:
+        # Stable hash of everything that affects output, computed once: treat a Config as immutable after use
+        if self.__fingerprint is not None:
+            return self.__fingerprint
 
-        if background is not None:
-            if isinstance(background, ImageType):
-                self.background = background
-            else:
-                if isinstance(background, Path):
-                    background = str(background)
-                self.background = Image.open(background)
+        fonts = ['header_font', 'subheader_font', 'main_font', 'text_font', 'small_text_font']
+        images = [self.background, self.logo_first_part, self.logo_second_part, self.sub_image]
 
-        if logo_first_part is not None:
-            if isinstance(logo_first_part, ImageType):
-                self.logo_first_part = logo_first_part
-            else:
-                if isinstance(logo_first_part, Path):
-                    logo_first_part = str(logo_first_part)
-                self.logo_first_part = Image.open(logo_first_part)
-        else:
-            self.logo_first_part = None
+        payload = json.dumps(
+            {
+                'fonts': [self.__font_key(name) for name in fonts],
+                'images': [None if image is None else image_digest(image) for image in images],
+                'text_color': self.text_color.hex_l,
+                'max_text_width': self.max_text_width,
+                'max_header_width': self.max_header_width,
+                'padding': self.padding,
+                'bottom_padding': self.bottom_padding,
+                'length': self.length,
+                'exact_measure': self.exact_measure,
+                'site': self.site,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
 
-        if logo_second_part is not None:
-            if isinstance(logo_second_part, ImageType):
-                self.logo_second_part = logo_second_part
-            else:
-                if isinstance(logo_second_part, Path):
-                    logo_second_part = str(logo_second_part)
-                self.logo_second_part = Image.open(logo_second_part)
-        else:
-            self.logo_second_part = None
+        if self.fallback_fonts is not None:
+            payload += ':' + json.dumps([file_digest(path) for path in self.fallback_fonts])
 
-        if sub_image is not None:
-            if isinstance(sub_image, ImageType):
-                self.sub_image = sub_image
-            else:
-                if isinstance(sub_image, Path):
-                    sub_image = str(sub_image)
-                self.sub_image = Image.open(sub_image)
-        else:
-            self.sub_image = None
+        if self.scale != 1:
+            # the fixed offsets in the layout are scaled too
+            payload += f':{self.scale!r}'
 
-        self.site = site
+        self.__fingerprint = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+        return self.__fingerprint
+
+    def __font_key(self, name: str) -> list:
+        # hashing the file doesn't need the font itself
+        font = self.__dict__.get(name)
+        if font is not None:
+            return [file_digest(font.path), font.size]
+
+        return [file_digest(self._sources[name]), getattr(self, name + 'size')]
+
+    def font_source(self, name: str) -> Union[ImageFont.FreeTypeFont, str]:
+        # the font if it's loaded (or was assigned), otherwise the path it loads from
+        return self.__dict__.get(name) or self._sources[name]
+
+    def font_chain(self, font: ImageFont.FreeTypeFont) -> List[ImageFont.FreeTypeFont]:
+        return [font] + [load_font(path, font.size) for path in self.fallback_fonts or ()]
+
+    def chain_coverages(self, font: ImageFont.FreeTypeFont) -> List[Coverage]:
+        # what the fonts of font_chain(font) cover, each file read and stat'ed once per config
+        return [self.__coverage(path) for path in [font.path, *(self.fallback_fonts or ())]]
+
+    def __coverage(self, path: str) -> Coverage:
+        covered = self.__coverages.get(path)
+        if covered is None:
+            covered = self.__coverages.setdefault(path, coverage(path))
+
+        return covered
+
+    def load(self):
+        # Pillow opens files lazily; decode everything up front so forked workers don't share file handles
+        for image in (self.background, self.logo_first_part, self.logo_second_part, self.sub_image):
+            if image is not None:
+                image.load()
+
+        return self
+
+    def __getstate__(self):
+        # colour.Color is not picklable, ship it to worker processes as a hex string
+        state = self.__dict__.copy()
+        state['text_color'] = self.text_color.hex_l
+        del state['_lock']
+
+        return state
+
+    def __setstate__(self, state):
+        state['text_color'] = Color(state['text_color'])
+        state['_lock'] = threading.RLock()
+        self.__dict__.update(state)
 
 
 class BaseGenerator:
@@ -187,52 +350,285 @@ class BaseGenerator:
     def _draw_two_part_logo(
         x: int, y: int,
         image: ImageType,
-        second_part: ImageType, first_part: ImageType
+        second_part: ImageType, first_part: ImageType,
+        gap: int = 5
     ) -> Tuple[int, int]:
         image.paste(first_part, (x, y), first_part)
-        image.paste(second_part, (x + first_part.width + 5, y), second_part)
+        image.paste(second_part, (x + first_part.width + gap, y), second_part)
 
-        return first_part.width + 5 + second_part.width, max(second_part.height, first_part.height)
+        return first_part.width + gap + second_part.width, max(second_part.height, first_part.height)
 
 
 class BannerGenerator(BaseGenerator):
     config: Config
 
-    def __init__(self, config: Config = None):
+    cache: Optional[RenderCache]
+    instrument: Optional[Instrument]
+
+    pool_size: int
+
+    def __init__(self, config: Config = None, cache: Optional[RenderCache] = None,
+                 instrument: Optional[Instrument] = None, pool_size: int = DEFAULT_POOL_SIZE):
         super().__init__(config=config)
 
         self.config = config
+        self.cache = cache
+        self.instrument = instrument
+        self.pool_size = pool_size
+
+        self.__static_config = None
+        self.__static = None
+
+        self.__pool = None
+
+        # renders draw on private canvases; this only guards the shared pieces built on first use, so one
+        # generator can serve many threads
+        self.__lock = threading.RLock()
 
     def generate(self, header: str, main_text: str, subheader: Optional[str] = None, small_text: Optional[str] = None):
-        return self.__gen(header, main_text, subheader, small_text)
+        if self.cache is None:
+            return self.__gen(header, main_text, subheader, small_text)
 
-    def generate_file(self, fp: Union[str, bytes, Path], header: str, main_text: str, subheader: Optional[str] = None,
-                      small_text: Optional[str] = None):
+        # lossless entry, a hit decodes to exactly the image a render would produce
+        options = EncoderOptions(format='PNG')
+        key = self.__cache_key(header, main_text, subheader, small_text, options)
+        data = self.cache.read(key, '.png')
+
+        if data is not None:
+            self._count('cache_hits')
+
+            with Image.open(io.BytesIO(data)) as image:
+                image.load()
+                return image
+
+        self._count('cache_misses')
         image = self.__gen(header, main_text, subheader, small_text)
+        self.cache.put(key, '.png', self._timed('encode', encode, image, options))
+
+        return image
 
-        image.save(fp)
+    def generate_file(self, fp: Union[str, bytes, Path], header: str, main_text: str, subheader: Optional[str] = None,
+                      small_text: Optional[str] = None, options: Optional[EncoderOptions] = None):
+        suffix = os.path.splitext(os.fsdecode(fp))[1].lower()
+        if options is None:
+            options = EncoderOptions.for_extension(suffix)
 
-    def __gen(self, header: str, main_text: str, subheader: Optional[str] = None,
-              small_text: Optional[str] = None) -> ImageType:
-        image = self.config.background
+        if self.cache is None:
+            # encoded the way generate_bytes does it, JPEG gets the same conversion to RGB
+            with self.__pooled(header, main_text, subheader, small_text) as image:
+                data = self._timed('encode', encode, image, options)
+
+            with open(fp, 'wb') as f:
+                f.write(data)
+            return
+
+        key = self.__cache_key(header, main_text, subheader, small_text, options)
+
+        if self.cache.export(key, suffix, fp):
+            self._count('cache_hits')
+            return
+
+        self._count('cache_misses')
+        with self.__pooled(header, main_text, subheader, small_text) as image:
+            data = self._timed('encode', encode, image, options)
+
+        self.cache.write(fp, data, self.cache.put(key, suffix, data))
+
+    def generate_bytes(self, header: str, main_text: str, subheader: Optional[str] = None,
+                       small_text: Optional[str] = None, options: Optional[EncoderOptions] = None) -> memoryview:
+        return self.generate_into(io.BytesIO(), header, main_text, subheader, small_text, options=options)
+
+    def generate_into(self, buffer: io.BytesIO, header: str, main_text: str, subheader: Optional[str] = None,
+                      small_text: Optional[str] = None, options: Optional[EncoderOptions] = None) -> memoryview:
+        return self._generate_into(buffer, header, main_text, subheader, small_text, options)[0]
+
+    def _generate_into(self, buffer: io.BytesIO, header: str, main_text: str, subheader: Optional[str] = None,
+                       small_text: Optional[str] = None, options: Optional[EncoderOptions] = None
+                       ) -> Tuple[memoryview, bool]:
+        # and whether it came from the cache, told by this lookup: the cache's counters are shared by threads
+        if options is None:
+            options = EncoderOptions()
+
+        if self.cache is None:
+            with self.__pooled(header, main_text, subheader, small_text) as image:
+                return self._timed('encode', encode_into, image, buffer, options), False
+
+        key = self.__cache_key(header, main_text, subheader, small_text, options)
+        data = self.cache.read(key, options.extension)
+
+        if data is None:
+            self._count('cache_misses')
+            with self.__pooled(header, main_text, subheader, small_text) as image:
+                view = self._timed('encode', encode_into, image, buffer, options)
+            self.cache.put(key, options.extension, view)
+
+            return view, False
+
+        self._count('cache_hits')
+        start = buffer.tell()
+        buffer.write(data)
+
+        return buffer.getbuffer()[start:buffer.tell()], True
+
+    def generate_variants(self, variants: Iterable[Variant], header: str, main_text: str,
+                          subheader: Optional[str] = None, small_text: Optional[str] = None) -> Dict[str, bytes]:
+        # one layout and one rasterisation for every size, see core.variants
+        variants = list(variants)
+
+        names = [variant.name for variant in variants]
+        if len(set(names)) != len(names):
+            raise ValueError(f'variant names must be unique, got {names}')
+
+        for variant in variants:
+            variant.options.check()
+
+        results = {}
+        keys = {}
+
+        if self.cache is not None:
+            for variant in variants:
+                keys[variant.name] = self.__cache_key(header, main_text, subheader, small_text, variant.options,
+                                                      variant)
+                data = self.cache.read(keys[variant.name], variant.options.extension)
+
+                if data is not None:
+                    results[variant.name] = data
+
+            self._count('cache_hits', len(results))
+            self._count('cache_misses', len(variants) - len(results))
+
+        missing = [variant for variant in variants if variant.name not in results]
+
+        if missing:
+            with self.__pooled(header, main_text, subheader, small_text) as image:
+                encoded = self._timed('encode', encode_variants, image, missing)
+
+            for variant in missing:
+                if self.cache is not None:
+                    self.cache.put(keys[variant.name], variant.options.extension, encoded[variant.name])
+
+            results.update(encoded)
+
+        return {name: results[name] for name in names}
+
+    def __cache_key(self, header: str, main_text: str, subheader: Optional[str], small_text: Optional[str],
+                    options: EncoderOptions, variant: Optional[Variant] = None) -> str:
+        fields = {'header': header, 'main_text': main_text, 'subheader': subheader, 'small_text': small_text}
+        save_kwargs = options.save_kwargs()
+
+        if variant is not None and variant.width is not None:
+            save_kwargs['variant'] = variant.key()
+
+        return make_key(self.config.fingerprint(), fields, options.format, save_kwargs)
+
+    def generate_many(self, records: Iterable[dict], workers: Optional[int] = None,
+                      ordered: bool = True, threads: bool = False) -> Iterator[Tuple[int, ImageType]]:
+        from core.batch import generate_many
+
+        return generate_many(self.config, records, workers=workers, ordered=ordered, cache=self.cache,
+                             threads=threads, generator=self)
+
+    def generate_many_files(self, records: Iterable[dict], workers: Optional[int] = None,
+                            ordered: bool = True, threads: bool = False) -> Iterator[Tuple[int, Any]]:
+        from core.batch import generate_many_files
+
+        return generate_many_files(self.config, records, workers=workers, ordered=ordered, cache=self.cache,
+                                   threads=threads, generator=self)
+
+    def aio(self, executor: Optional[Executor] = None, concurrency: Optional[int] = None,
+            timeout: Optional[float] = None) -> 'AsyncBannerGenerator':
+        from core.aio import AsyncBannerGenerator
+
+        return AsyncBannerGenerator(self, executor=executor, concurrency=concurrency, timeout=timeout)
+
+    def incremental(self) -> 'IncrementalRenderer':
+        from core.incremental import IncrementalRenderer
+
+        return IncrementalRenderer(self)
+
+    def _static_layout(self) -> Tuple[int, int, bool, Optional[TextItem]]:
+        px = self.config.px
+        image_height = self.config.background.height
+
+        logoless = False
+
+        if self.config.logo_first_part is not None and self.config.logo_second_part is not None:
+            logo_y = image_height - self.config.bottom_padding - self.config.logo_second_part.height
+            logo_width = self.config.logo_first_part.width + px(5) + self.config.logo_second_part.width
+        else:
+            logo_y = image_height - self.config.bottom_padding
+            logo_width = 0
+            logoless = True
+
+        site = None
+
+        if self.config.site is not None and len(self.config.site) > 0:
+            corrector = 0 if logoless else px(40)
+            site = TextItem.of(self.config.site, (self.config.padding + logo_width + corrector, logo_y - px(15)),
+                               self.config.text_font)
+
+        return logo_y, logo_width, logoless, site
+
+    def _static_layers(self) -> ImageType:
+        # Logo and site never change between banners sharing a Config, compose them once
+        if self.__static is not None and self.__static_config is self.config:
+            return self.__static
+
+        with self.__lock:
+            return self.__compose_static()
+
+    def __compose_static(self) -> ImageType:
+        if self.__static is not None and self.__static_config is self.config:
+            return self.__static
+
+        started = time.perf_counter()
+
+        image = self.config.background.copy()
         image_editable = ImageDraw.Draw(image)
 
-        image_height = image.height
+        logo_y, logo_width, logoless, site = self._static_layout()
 
-        start_y = self.config.padding - 30
+        if not logoless:
+            self._timed('composite', BaseGenerator._draw_two_part_logo, self.config.padding, logo_y, image,
+                        self.config.logo_second_part, self.config.logo_first_part, self.config.px(5))
 
-        sub_image = self.config.sub_image
+        if site is not None:
+            for position, text, font in self._runs(site):
+                self._timed('draw', draw_text, image_editable, position, text, self.config.text_color.hex, font)
+
+        if self.instrument is not None:
+            self.instrument.span('static', time.perf_counter() - started)
+
+        self.__static_config = self.config
+        self.__static = image
+
+        return self.__static
+
+    def layout(self, header: str, main_text: str, subheader: Optional[str] = None,
+               small_text: Optional[str] = None) -> LayoutPlan:
+        logo_y, logo_width, logoless, site = self._static_layout()
+
+        px = self.config.px
+        image_width, image_height = self.config.background.size
 
-        header_font = self.config.header_font
+        start_y = self.config.padding - px(30)
+
+        sub_image = self.config.sub_image
 
         if len(header) > 60:
-            header_font = find_suitable_fontsize(self.config.max_header_width, header_font, header, self.config.length)
+            # fitted from the font file, header_font at its default size isn't needed
+            header_font = self._timed('fit', find_suitable_fontsize, self.config.max_header_width,
+                                      self.config.font_source('header_font'), header, self.config.length,
+                                      fallbacks=self.config.fallback_fonts)
+        else:
+            header_font = self.config.header_font
 
-        header_text = bruteforce(header, self.config.max_header_width, header_font,
-                                 count=self.config.length)
+        header_text = self._timed('wrap', break_lines, header, self.config.max_header_width, header_font,
+                                  count=self.config.length, exact=self.config.exact_measure,
+                                  fallbacks=self._fallbacks(header_font))
         header_line_height = header_font.getsize(header_text[0])[1]
 
-        pattern = []
+        header_items = []
         for i in range(len(header_text)):
             text = header_text[i]
 
@@ -241,70 +637,50 @@ class BannerGenerator(BaseGenerator):
             else:
                 padding_y = start_y + i * header_line_height
 
-            pattern.append((text, (self.config.padding, padding_y)))
+            header_items.append(TextItem.of(text, (self.config.padding, padding_y), header_font))
 
-        for text, bounds in pattern:
-            image_editable.text(bounds, text, self.config.text_color.hex, font=header_font)
+        height = header_items[-1].position[1] + header_line_height
 
-        height = pattern[-1][1][1] + header_line_height
+        subheader_item = None
+        underline = None
 
         if subheader is not None and len(subheader) > 0:
-            subheader_y = height + 20
+            subheader_y = height + px(20)
 
             subheader_font = self.config.subheader_font
-            if self.config.subheader_font.getsize(subheader)[0] > self.config.max_header_width:
-                subheader_font = find_suitable_fontsize(self.config.max_header_width, subheader_font, subheader,
-                                                        len(subheader))
-
-            image_editable.text((self.config.padding, subheader_y), subheader, self.config.text_color.hex,
-                                font=subheader_font)
-
-            line_y = subheader_y + subheader_font.getsize(subheader)[1] + 4
-            image_editable.line(
-                [
-                    (self.config.padding, line_y),
-                    (self.config.padding + subheader_font.getsize(subheader)[0], line_y),
-                ],
-                fill=self.config.text_color.hex,
-                width=3
-            )
+            if self._text_width(subheader, self.config.subheader_font) > self.config.max_header_width:
+                subheader_font = self._timed('fit', find_suitable_fontsize, self.config.max_header_width,
+                                             subheader_font, subheader, len(subheader),
+                                             fallbacks=self.config.fallback_fonts)
 
-            height = line_y + 5
+            subheader_item = TextItem.of(subheader, (self.config.padding, subheader_y), subheader_font)
 
-        logoless = False
+            line_y = subheader_y + subheader_font.getsize(subheader)[1] + px(4)
+            underline = (
+                (self.config.padding, line_y),
+                (self.config.padding + self._text_width(subheader, subheader_font), line_y),
+            )
 
-        if self.config.logo_first_part is not None and self.config.logo_second_part is not None:
-            logo_y = image_height - self.config.bottom_padding - self.config.logo_second_part.height
-            logo_width, logo_height = BaseGenerator._draw_two_part_logo(self.config.padding, logo_y, image,
-                                                                        self.config.logo_second_part,
-                                                                        self.config.logo_first_part)
-        else:
-            logo_y = image_height - self.config.bottom_padding
-            logo_width = 0
-            logoless = True
+            height = line_y + px(5)
 
         based_x = self.config.padding + logo_width
-        based_y = logo_y - 5
+        based_y = logo_y - px(5)
+
+        small_text_item = None
+        small_text_corrector = None
 
         if small_text is not None and len(small_text) > 0 and not logoless:
-            print(ru_re.fullmatch(small_text), small_text)
-            corrector = 0 if ru_re.fullmatch(small_text) is not None else 5
-            based_y = logo_y - self.config.small_text_font.getsize(small_text)[1] - corrector
-            b_w = self.config.small_text_font.getsize(small_text)[0]
+            small_text_corrector = 0 if ru_re.fullmatch(small_text) is not None else px(5)
+            based_y = logo_y - self.config.small_text_font.getsize(small_text)[1] - small_text_corrector
+            b_w = self._text_width(small_text, self.config.small_text_font)
             based_x = based_x - b_w
-            image_editable.text((based_x, based_y), small_text, self.config.text_color.hex,
-                                font=self.config.small_text_font)
+            small_text_item = TextItem.of(small_text, (based_x, based_y), self.config.small_text_font)
 
         bottom_height = image_height - based_y
 
-        if self.config.site is not None and len(self.config.site) > 0:
-            corrector = 0 if logoless else 40
-
-            image_editable.text((self.config.padding + logo_width + corrector, logo_y - 15), self.config.site,
-                                self.config.text_color.hex,
-                                font=self.config.text_font)
-
-        main_text = bruteforce(main_text, self.config.max_text_width, self.config.main_font, count=self.config.length)
+        main_text = self._timed('wrap', break_lines, main_text, self.config.max_text_width, self.config.main_font,
+                                count=self.config.length, exact=self.config.exact_measure,
+                                fallbacks=self._fallbacks(self.config.main_font))
         ru_line_height = self.config.main_font.getsize(main_text[0])[1]
 
         pattern = []
@@ -323,31 +699,170 @@ class BannerGenerator(BaseGenerator):
         available_h = (image_height - bottom_height) - height
         middle = int(available_h / 2)
 
-        save_zone = 5
+        save_zone = px(5)
 
         no_need_sub_image = False
 
         if sub_image is None or middle < sub_image.height + save_zone or main_text_height > middle:
             no_need_sub_image = True
 
+        sub_image_position = None
+
         if no_need_sub_image:
             half = int(len(pattern)) / 2
             start_y = height + middle - half * ru_line_height
-            for text, bounds in pattern:
-                image_editable.text((bounds[0], start_y + bounds[1]), text, self.config.text_color.hex,
-                                    font=self.config.subheader_font)
         else:
-            start_y = height + middle + 10
-            for text, bounds in pattern:
-                image_editable.text((bounds[0], start_y + bounds[1]), text, self.config.text_color.hex,
-                                    font=self.config.subheader_font)
+            start_y = height + middle + px(10)
+            sub_image_position = (self.config.padding, height + middle - px(10) - sub_image.height)
+
+        # main text is measured with main_font but drawn with subheader_font
+        main_items = [TextItem.of(text, (bounds[0], start_y + bounds[1]), self.config.subheader_font)
+                      for text, bounds in pattern]
+
+        return LayoutPlan(
+            size=(image_width, image_height),
+            color=self.config.text_color.hex,
+            header=header_items,
+            subheader=subheader_item,
+            underline=underline,
+            small_text=small_text_item,
+            main_text=main_items,
+            sub_image=sub_image_position,
+            logo=None if logoless else (self.config.padding, logo_y),
+            site=site,
+            correctors={
+                'small_text': small_text_corrector,
+                'site': None if site is None else (0 if logoless else px(40)),
+            },
+        )
+
+    def render(self, plan: LayoutPlan) -> ImageType:
+        return self.__render(plan)
+
+    def __render(self, plan: LayoutPlan, pooled: bool = False) -> ImageType:
+        image = self.__draw(plan, pooled)
+
+        if plan.sub_image is not None:
+            sub_image = self.config.sub_image
+            self._timed('composite', image.paste, sub_image, plan.sub_image, sub_image)
+
+        return image
+
+    def _canvas_pool(self) -> CanvasPool:
+        base = self._static_layers()
+
+        with self.__lock:
+            if self.__pool is None or self.__pool.base is not base:
+                self.__pool = CanvasPool(base, self.pool_size)
+
+            return self.__pool
+
+    def __draw(self, plan: LayoutPlan, pooled: bool = False) -> ImageType:
+        base = self._static_layers()
+
+        if tuple(base.size) != plan.size:
+            raise ValueError(f'Plan is laid out for {plan.size}, background is {base.size}')
+
+        image = self._timed('composite', self._canvas_pool().acquire if pooled else base.copy)
+        image_editable = ImageDraw.Draw(image)
 
-            image.paste(sub_image, (self.config.padding, height + middle - 10 - sub_image.height), sub_image)
+        texts = list(plan.header)
+        if plan.subheader is not None:
+            texts.append(plan.subheader)
+
+        for item in texts:
+            for position, text, font in self._runs(item):
+                self._timed('draw', draw_text, image_editable, position, text, plan.color, font)
+
+        if plan.underline is not None:
+            self._timed('draw', image_editable.line, list(plan.underline), fill=plan.color,
+                        width=self.config.px(UNDERLINE_WIDTH))
+
+        texts = list(plan.main_text)
+        if plan.small_text is not None:
+            texts.insert(0, plan.small_text)
+
+        for item in texts:
+            for position, text, font in self._runs(item):
+                self._timed('draw', draw_text, image_editable, position, text, plan.color, font)
+
+        return image
+
+    def __gen(self, header: str, main_text: str, subheader: Optional[str] = None,
+              small_text: Optional[str] = None, pooled: bool = False) -> ImageType:
+        if self.instrument is None:
+            return self.__render(self.layout(header, main_text, subheader, small_text), pooled)
+
+        font_loads = load_font.cache_info().misses
+        masks = mask_cache_info()
+
+        plan = self._timed('layout', self.layout, header, main_text, subheader, small_text)
+        image = self._timed('render', self.__render, plan, pooled)
+
+        self.instrument.count('banners')
+        self.instrument.count('lines', len(plan.header) + len(plan.main_text))
+        self.instrument.count('text_draws', len(plan.header) + len(plan.main_text) + (plan.subheader is not None)
+                              + (plan.small_text is not None))
+        self.instrument.count('font_loads', load_font.cache_info().misses - font_loads)
+        self.instrument.count('mask_hits', mask_cache_info().hits - masks.hits)
+        self.instrument.count('mask_misses', mask_cache_info().misses - masks.misses)
 
         return image
 
+    @contextmanager
+    def __pooled(self, header: str, main_text: str, subheader: Optional[str] = None,
+                 small_text: Optional[str] = None) -> Iterator[ImageType]:
+        # for renders that are encoded and dropped: the canvas goes back to the pool afterwards
+        image = self.__gen(header, main_text, subheader, small_text, pooled=True)
+        try:
+            yield image
+        finally:
+            self._canvas_pool().release(image)
+
+    def _runs(self, item: TextItem) -> List[Tuple[Point, str, ImageFont.FreeTypeFont]]:
+        # what drawing an item comes down to: one text in its own font, or runs along the fallback chain
+        if self.config.fallback_fonts is None:
+            return [(item.position, item.text, item.font)]
+
+        return positioned_runs(item.text, item.position, self.config.font_chain(item.font),
+                               self.config.chain_coverages(item.font))
+
+    def _fallbacks(self, font: ImageFont.FreeTypeFont) -> Optional[List[ImageFont.FreeTypeFont]]:
+        # for measuring text the way _runs draws it
+        if self.config.fallback_fonts is None:
+            return None
+
+        return self.config.font_chain(font)[1:]
+
+    def _text_width(self, text: str, font: ImageFont.FreeTypeFont) -> int:
+        if self.config.fallback_fonts is None:
+            return font.getsize(text)[0]
+
+        return math.ceil(runs_width(text, self.config.font_chain(font), self.config.chain_coverages(font)))
+
+    def _timed(self, name: str, fn, *args, **kwargs):
+        instrument = self.instrument
+        if instrument is None:
+            return fn(*args, **kwargs)
+
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            instrument.span(name, time.perf_counter() - started)
+
+    def _count(self, name: str, value: int = 1):
+        if self.instrument is not None:
+            self.instrument.count(name, value)
+
 
 class GeneratorFactory:
     @staticmethod
-    def banner(config: Config) -> BannerGenerator:
-        return BannerGenerator(config)
+    def banner(config: Config, cache: Optional[RenderCache] = None, instrument: Optional[Instrument] = None,
+               pool_size: int = DEFAULT_POOL_SIZE) -> BannerGenerator:
+        return BannerGenerator(config, cache=cache, instrument=instrument, pool_size=pool_size)
+
+    @staticmethod
+    def banner_many(config: Config, records: Iterable[dict], workers: Optional[int] = None,
+                    ordered: bool = True, threads: bool = False) -> Iterator[Tuple[int, ImageType]]:
+        return BannerGenerator(config).generate_many(records, workers=workers, ordered=ordered, threads=threads)
@@ -0,0 +1,122 @@
+import math
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from PIL import ImageFont
+
+from core.coverage import Coverage, coverage, runs_width
+
+MAX_ENTRIES = 65536
+
+
+class TextMeasurer:
+    font: ImageFont
+    # with fallbacks (even none), text is measured the way it is drawn: in runs along the font and its
+    # fallbacks, without the characters none of them has
+    fonts: Optional[List[ImageFont.FreeTypeFont]]
+    coverages: Optional[List[Coverage]]
+
+    hits: int
+    misses: int
+
+    def __init__(self, font: ImageFont, max_entries: int = MAX_ENTRIES,
+                 fallbacks: Optional[Sequence[ImageFont.FreeTypeFont]] = None):
+        self.font = font
+        self.fonts = None if fallbacks is None else [font, *fallbacks]
+        self.coverages = None if fallbacks is None else [coverage(font.path) for font in self.fonts]
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+
+        self.__advances: Dict[str, float] = {}
+        self.__widths: Dict[str, int] = {}
+
+        # lookups are plain dict reads, only inserting and evicting take the lock
+        self.__lock = threading.Lock()
+
+    def __lookup(self, cache: dict, key: str, measure):
+        value = cache.get(key)
+
+        if value is None:
+            value = measure(key)
+
+            with self.__lock:
+                self.misses += 1
+
+                if len(cache) >= self.max_entries:
+                    # drop the oldest entry, dicts keep insertion order
+                    del cache[next(iter(cache))]
+                cache[key] = value
+        else:
+            self.hits += 1
+
+        return value
+
+    def __length(self, text: str) -> float:
+        if self.fonts is None:
+            return self.font.getlength(text)
+
+        return runs_width(text, self.fonts, self.coverages)
+
+    def __size(self, line: str) -> int:
+        if self.fonts is None:
+            return self.font.getsize(line)[0]
+
+        return math.ceil(runs_width(line, self.fonts, self.coverages))
+
+    def advance(self, word: str) -> float:
+        return self.__lookup(self.__advances, word, self.__length)
+
+    def width(self, text: str, exact: bool = False) -> float:
+        if exact:
+            # whole-line layout, accounts for kerning across word boundaries
+            return self.__lookup(self.__widths, text, self.__size)
+
+        words = text.split(' ')
+
+        return sum(self.advance(word) for word in words) + self.advance(' ') * (len(words) - 1)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+
+        return self.hits / total if total else 0.0
+
+    def clear(self):
+        with self.__lock:
+            self.__advances.clear()
+            self.__widths.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_measurers: Dict[Tuple[str, int, Optional[Tuple[str, ...]]], TextMeasurer] = {}
+
+
+def get_measurer(font: ImageFont, fallbacks: Optional[Sequence[ImageFont.FreeTypeFont]] = None) -> TextMeasurer:
+    key = (font.path, font.size, None if fallbacks is None else tuple(fallback.path for fallback in fallbacks))
+
+    measurer = _measurers.get(key)
+    if measurer is None:
+        # two threads may both miss, setdefault keeps a single measurer
+        measurer = _measurers.setdefault(key, TextMeasurer(font, fallbacks=fallbacks))
+
+    return measurer
+
+
+def cache_info() -> dict:
+    measurers = list(_measurers.values())
+    hits = sum(measurer.hits for measurer in measurers)
+    misses = sum(measurer.misses for measurer in measurers)
+
+    return {
+        'fonts': len(measurers),
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+    }
+
+
+def clear_cache():
+    _measurers.clear()
@@ -0,0 +1,56 @@
+import threading
+from typing import List
+
+from PIL.Image import Image as ImageType
+
+DEFAULT_POOL_SIZE = 4
+
+
+class CanvasPool:
+    # Full-size canvases for renders that are encoded and dropped. A released canvas is kept (up to
+    # `size` of them) and reset from the base by pasting over its existing buffer instead of allocating
+    base: ImageType
+    size: int
+
+    def __init__(self, base: ImageType, size: int = DEFAULT_POOL_SIZE):
+        self.base = base
+        self.size = size
+
+        self.__free: List[ImageType] = []
+        self.__lock = threading.Lock()
+
+        self.allocated = 0
+        self.reused = 0
+
+    def acquire(self) -> ImageType:
+        with self.__lock:
+            canvas = self.__free.pop() if self.__free else None
+
+            if canvas is None:
+                self.allocated += 1
+            else:
+                self.reused += 1
+
+        # the copy or the reset runs outside the lock, the canvas belongs to this caller alone
+        if canvas is None:
+            return self.base.copy()
+
+        canvas.paste(self.base, (0, 0))
+
+        return canvas
+
+    def release(self, canvas: ImageType):
+        if canvas.size != self.base.size or canvas.mode != self.base.mode:
+            return
+
+        with self.__lock:
+            if len(self.__free) < self.size:
+                self.__free.append(canvas)
+
+    @property
+    def idle(self) -> int:
+        return len(self.__free)
+
+    def clear(self):
+        with self.__lock:
+            self.__free.clear()
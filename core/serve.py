@@ -0,0 +1,385 @@
+import argparse
+import asyncio
+import concurrent.futures
+import functools
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from typing import Dict, Optional, Set, Tuple
+
+from PIL import Image
+
+from core import batch
+from core.cache import RenderCache
+from core.encoding import EncoderOptions
+from core.main import Config
+from core.template import load_template
+from core.utils import percentile
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+DEFAULT_MAX_QUEUE = 64
+
+MAX_BODY = 64 * 1024
+READ_TIMEOUT = 30
+LATENCY_WINDOW = 1024
+
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+
+class QueueFull(Exception):
+    pass
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+
+        self.status = status
+        self.message = message
+
+
+def request_key(record: dict) -> str:
+    payload = json.dumps(record, sort_keys=True, ensure_ascii=False)
+
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, dict, bytes, bool]]:
+    line = await reader.readline()
+    if not line:
+        return None
+
+    try:
+        method, target, version = line.decode('latin-1').split()
+    except ValueError:
+        raise HttpError(400, 'malformed request line')
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HttpError(400, 'bad content-length')
+
+    if length > MAX_BODY:
+        raise HttpError(413, 'request body too large')
+
+    body = await reader.readexactly(length) if length > 0 else b''
+
+    connection = headers.get('connection', '').lower()
+    keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+
+    return method.upper(), target.split('?', 1)[0], headers, body, keep_alive
+
+
+def write_response(writer: asyncio.StreamWriter, status: int, content_type: str, body: bytes, keep_alive: bool,
+                   headers: Optional[dict] = None):
+    lines = [
+        f'HTTP/1.1 {status} {REASONS.get(status, "")}',
+        f'Content-Type: {content_type}',
+        f'Content-Length: {len(body)}',
+        f'Connection: {"keep-alive" if keep_alive else "close"}',
+    ]
+    lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+    writer.write(body)
+
+
+def json_body(data) -> Tuple[str, bytes]:
+    return 'application/json', json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class RenderServer:
+    config: Config
+    cache: Optional[RenderCache]
+
+    workers: int
+    threads: bool
+    max_queue: int
+
+    host: str
+    port: int
+
+    def __init__(
+        self,
+        config: Config,
+        workers: Optional[int] = None,
+        threads: bool = False,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        cache: Optional[RenderCache] = None,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT
+    ):
+        self.config = config
+        self.cache = cache
+
+        self.workers = workers or os.cpu_count() or 1
+        self.threads = threads
+        self.max_queue = max_queue
+
+        self.host = host
+        self.port = port
+
+        self.executor = None
+        self.server = None
+        self.__render = batch.render_bytes
+
+        self.requests = 0
+        self.renders = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+        # one future per distinct render that is queued or running, and the executor's side of each
+        self.__inflight: Dict[str, asyncio.Future] = {}
+        self.__submitted: Set[concurrent.futures.Future] = set()
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+
+        self.executor = batch.make_executor(self.config, self.cache, self.workers, self.threads, warm=True)
+        if self.threads:
+            # this server's own generator, other servers in the process keep theirs
+            generator = batch.make_generator(self.config, self.cache, warm=True)
+            self.__render = batch.bind(batch.render_bytes, generator)
+
+        # bring every worker up (and through its warm-up render) before accepting traffic
+        await asyncio.gather(*(loop.run_in_executor(self.executor, os.getpid) for _ in range(self.workers)))
+
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+        if self.executor is not None:
+            batch.shutdown(self.executor, self.__submitted)
+
+    async def serve_forever(self):
+        await self.start()
+        print(f'Serving on http://{self.host}:{self.port} with {self.workers} workers', flush=True)
+
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.__inflight)
+
+    async def render(self, record: dict) -> Tuple[bytes, bool]:
+        key = request_key(record)
+
+        future = self.__inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            data, _ = await asyncio.shield(future)
+
+            return data, True
+
+        if len(self.__inflight) >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull()
+
+        submitted = self.executor.submit(self.__render, record)
+        self.__submitted.add(submitted)
+        submitted.add_done_callback(self.__submitted.discard)
+
+        future = asyncio.wrap_future(submitted)
+        future.add_done_callback(functools.partial(self.__finished, key, time.perf_counter()))
+        self.__inflight[key] = future
+
+        # a client going away must not cancel a render other clients may be waiting on
+        data, _ = await asyncio.shield(future)
+
+        return data, False
+
+    def __finished(self, key: str, started: float, future: asyncio.Future):
+        self.__inflight.pop(key, None)
+
+        if future.cancelled() or future.exception() is not None:
+            self.errors += 1
+            return
+
+        self.renders += 1
+        self.latencies.append(time.perf_counter() - started)
+
+        if future.result()[1]:
+            self.cache_hits += 1
+
+    def metrics(self) -> dict:
+        latencies = list(self.latencies)
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value * 1000, 3)
+
+        return {
+            'queue_depth': self.queue_depth,
+            'max_queue': self.max_queue,
+            'workers': self.workers,
+            'threads': self.threads,
+            'requests': self.requests,
+            'renders': self.renders,
+            'coalesced': self.coalesced,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'latency_ms': {
+                'p50': ms(percentile(latencies, 50)),
+                'p95': ms(percentile(latencies, 95)),
+                'p99': ms(percentile(latencies, 99)),
+            },
+            'cache': {
+                'hits': self.cache_hits,
+                'coalesced': self.coalesced,
+            },
+        }
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, str, bytes, dict]:
+        if path == '/health':
+            if method != 'GET':
+                raise HttpError(405, 'use GET')
+
+            return 200, 'text/plain', b'ok', {}
+
+        if path == '/metrics':
+            if method != 'GET':
+                raise HttpError(405, 'use GET')
+
+            return (200, *json_body(self.metrics()), {})
+
+        if path == '/render':
+            if method != 'POST':
+                raise HttpError(405, 'use POST')
+
+            return await self.dispatch_render(body)
+
+        raise HttpError(404, f'no route for {path}')
+
+    async def dispatch_render(self, body: bytes) -> Tuple[int, str, bytes, dict]:
+        try:
+            request = json.loads(body.decode('utf-8'))
+        except ValueError:
+            raise HttpError(400, 'body must be JSON')
+
+        if not isinstance(request, dict):
+            raise HttpError(400, 'body must be a JSON object')
+
+        for key in ('header', 'main_text'):
+            if not isinstance(request.get(key), str):
+                raise HttpError(400, f'{key} is required')
+
+        record = {key: request[key] for key in batch.RECORD_FIELDS if request.get(key) is not None}
+        record['options'] = request.get('options') or {}
+
+        try:
+            options = EncoderOptions(**record['options'])
+            options.check()
+        except (TypeError, ValueError, AttributeError) as e:
+            raise HttpError(400, f'bad options: {e}')
+
+        try:
+            data, coalesced = await self.render(record)
+        except QueueFull:
+            return (503, *json_body({'error': 'render queue is full'}), {'Retry-After': '1'})
+
+        content_type = Image.MIME.get(options.format, 'application/octet-stream')
+
+        return 200, content_type, data, {'X-Coalesced': '1' if coalesced else '0'}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                keep_alive = False
+
+                try:
+                    request = await asyncio.wait_for(read_request(reader), READ_TIMEOUT)
+                    if request is None:
+                        break
+
+                    method, path, headers, body, keep_alive = request
+                    self.requests += 1
+
+                    status, content_type, payload, extra = await self.dispatch(method, path, body)
+                except HttpError as e:
+                    status, extra = e.status, {}
+                    content_type, payload = json_body({'error': e.message})
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    status, extra = 500, {}
+                    content_type, payload = json_body({'error': str(e)})
+
+                write_response(writer, status, content_type, payload, keep_alive, extra)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(prog='python -m core.serve', description='Banner rendering HTTP service')
+
+    ap.add_argument('-c', '--config', required=True,
+                    help='Template JSON')
+    ap.add_argument('--host', default=DEFAULT_HOST,
+                    help='Address to bind')
+    ap.add_argument('--port', type=int, default=DEFAULT_PORT,
+                    help='Port to bind')
+    ap.add_argument('-w', '--workers', type=int,
+                    help='Render processes (or threads), defaults to the number of CPUs')
+    ap.add_argument('--threads', action='store_true',
+                    help='Render on threads sharing one copy of the fonts and images instead of processes')
+    ap.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE,
+                    help='Distinct renders allowed in flight before answering 503')
+    ap.add_argument('--cache-dir',
+                    help='Keep rendered banners in this directory')
+    ap.add_argument('--cache-size', type=int, default=1024,
+                    help='Render cache budget, MB')
+    ap.add_argument('--asset-cache',
+                    help='Keep logos and overlays decoded and resized in this directory between runs')
+
+    args = ap.parse_args(args)
+
+    cache = None
+    if args.cache_dir:
+        cache = RenderCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024)
+
+    server = RenderServer(load_template(args.config, args.asset_cache), workers=args.workers,
+                          threads=args.threads, max_queue=args.max_queue, cache=cache, host=args.host, port=args.port)
+
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
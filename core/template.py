@@ -0,0 +1,255 @@
+import functools
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Union, Optional
+
+from core.assets import AssetCache, RESAMPLING, prepare
+from core.main import Config
+from core.utils import file_digest
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+FONT_KEYS = ('header_font', 'subheader_font', 'main_font', 'text_font', 'small_text_font')
+FONT_LIST_KEYS = ('fallback_fonts',)
+IMAGE_KEYS = ('background', 'logo_first_part', 'logo_second_part', 'sub_image')
+VALUE_KEYS = ('max_text_width', 'max_header_width', 'text_color', 'padding', 'bottom_padding', 'header_fontsize',
+              'subheader_fontsize', 'main_fontsize', 'text_fontsize', 'small_text_fontsize', 'site', 'length',
+              'exact_measure', 'output_width')
+
+CONFIG_CACHE_SIZE = 16
+
+
+def _resolve(base: Path, path: str) -> str:
+    # absolute, so a spec means the same thing in any working directory
+    return os.path.abspath(base / Path(path).expanduser())
+
+
+def _relative(base: Path, path: str) -> str:
+    try:
+        return Path(os.path.relpath(path, base)).as_posix()
+    except ValueError:
+        # another drive on Windows
+        return path
+
+
+def _load_image(path: str, value: dict, assets: Optional[AssetCache] = None):
+    transform = {key: value.get(key) for key in ('scale', 'resample')}
+    transform['transparent'] = value.get('transparent', False)
+
+    if assets is None:
+        return prepare(path, **transform)
+
+    return assets.load(path, **transform)
+
+
+def _image_source(value: Union[str, dict], assets: Optional[AssetCache] = None):
+    # an image entry is either a path or {"path": ..., "transparent": true, "scale": 0.45, "resample": "lanczos"}
+    if isinstance(value, str):
+        return value
+
+    if value.get('resample') is not None and value['resample'] not in RESAMPLING:
+        raise ValueError(f'unknown resampling filter {value["resample"]!r}')
+
+    # Config runs the transform the first time the image is used
+    return functools.partial(_load_image, value['path'], value, assets)
+
+
+def _toml_value(value) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+
+    if isinstance(value, (int, float)):
+        return repr(value)
+
+    if isinstance(value, str):
+        # JSON string escapes are valid TOML basic string escapes
+        return json.dumps(value, ensure_ascii=False)
+
+    if isinstance(value, dict):
+        return '{ ' + ', '.join(f'{key} = {_toml_value(item)}' for key, item in value.items()) + ' }'
+
+    if isinstance(value, list):
+        return '[' + ', '.join(_toml_value(item) for item in value) + ']'
+
+    raise TypeError(f'cannot write {type(value).__name__} to TOML')
+
+
+class ConfigSpec:
+    # Plain data describing a Config: resolved asset paths, sizes, colour, paddings and site.
+    # Cheap to pickle, workers get a spec and build their Config once per process, see config().
+    # assets is an optional core.assets.AssetCache directory for the transformed images, it doesn't
+    # change the output and is left out of the digest
+    values: dict
+    assets: Optional[str]
+
+    def __init__(self, values: dict, assets: Optional[Union[str, Path]] = None):
+        unknown = set(values) - set(FONT_KEYS + FONT_LIST_KEYS + IMAGE_KEYS + VALUE_KEYS)
+        if unknown:
+            raise ValueError(f'unknown config keys: {", ".join(sorted(unknown))}')
+
+        self.values = dict(values)
+        self.assets = None if assets is None else os.fspath(assets)
+        self.__digest = None
+        self.__asset_cache = None
+
+    @classmethod
+    def from_template(cls, template: dict, base: Optional[Union[str, Path]] = None,
+                      assets: Optional[Union[str, Path]] = None) -> 'ConfigSpec':
+        base = Path(base or '.')
+        values = dict(template)
+
+        for key in FONT_KEYS:
+            if values.get(key) is not None:
+                values[key] = _resolve(base, values[key])
+
+        for key in FONT_LIST_KEYS:
+            if values.get(key) is not None:
+                values[key] = [_resolve(base, path) for path in values[key]]
+
+        for key in IMAGE_KEYS:
+            value = values.get(key)
+
+            if isinstance(value, str):
+                values[key] = _resolve(base, value)
+            elif value is not None:
+                values[key] = dict(value, path=_resolve(base, value['path']))
+
+        return cls(values, assets)
+
+    def to_template(self, base: Optional[Union[str, Path]] = None) -> dict:
+        # the inverse of from_template, paths relative to base
+        base = Path(base or '.').resolve()
+        template = dict(self.values)
+
+        for key in FONT_KEYS:
+            if template.get(key) is not None:
+                template[key] = _relative(base, template[key])
+
+        for key in FONT_LIST_KEYS:
+            if template.get(key) is not None:
+                template[key] = [_relative(base, path) for path in template[key]]
+
+        for key in IMAGE_KEYS:
+            value = template.get(key)
+
+            if isinstance(value, str):
+                template[key] = _relative(base, value)
+            elif value is not None:
+                template[key] = dict(value, path=_relative(base, value['path']))
+
+        return template
+
+    @classmethod
+    def load(cls, path: Union[str, Path], assets: Optional[Union[str, Path]] = None) -> 'ConfigSpec':
+        path = Path(path)
+
+        if path.suffix.lower() == '.toml':
+            if tomllib is None:
+                raise ImportError('reading TOML templates needs Python 3.11+ or the tomli package')
+
+            with open(path, 'rb') as f:
+                template = tomllib.load(f)
+        else:
+            with open(path, encoding='utf-8') as f:
+                template = json.load(f)
+
+        # relative asset paths are relative to the template itself
+        return cls.from_template(template, path.parent, assets)
+
+    def save(self, path: Union[str, Path]):
+        path = Path(path)
+        template = {key: value for key, value in self.to_template(path.parent).items() if value is not None}
+
+        if path.suffix.lower() == '.toml':
+            text = ''.join(f'{key} = {_toml_value(value)}\n' for key, value in template.items())
+        else:
+            text = json.dumps(template, indent=2, ensure_ascii=False) + '\n'
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def digest(self) -> str:
+        # covers file contents too, an edited font or image on disk gives a new digest
+        if self.__digest is not None:
+            return self.__digest
+
+        files = {}
+        for key in FONT_KEYS + IMAGE_KEYS:
+            value = self.values.get(key)
+            path = value['path'] if isinstance(value, dict) else value
+
+            if path is not None and os.path.isfile(path):
+                files[key] = file_digest(path)
+
+        for key in FONT_LIST_KEYS:
+            for i, path in enumerate(self.values.get(key) or ()):
+                if os.path.isfile(path):
+                    files[f'{key}.{i}'] = file_digest(path)
+
+        payload = json.dumps({'values': self.values, 'files': files}, sort_keys=True, ensure_ascii=False)
+        self.__digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+        return self.__digest
+
+    def build(self) -> Config:
+        kwargs = dict(self.values)
+
+        for key in IMAGE_KEYS:
+            if kwargs.get(key) is not None:
+                kwargs[key] = _image_source(kwargs[key], self.asset_cache)
+
+        config = Config(**kwargs)
+        config.spec = self
+
+        return config
+
+    @property
+    def asset_cache(self) -> Optional[AssetCache]:
+        # one per spec, shared by its images, so its hits and misses add up
+        if self.assets is not None and self.__asset_cache is None:
+            self.__asset_cache = AssetCache(self.assets)
+
+        return self.__asset_cache
+
+    def config(self) -> Config:
+        # one Config per spec per process, so its fonts and images are loaded at most once
+        return _cached_config(self)
+
+    def __getstate__(self):
+        return {'values': self.values, 'assets': self.assets}
+
+    def __setstate__(self, state):
+        self.values = state['values']
+        self.assets = state['assets']
+        self.__digest = None
+        self.__asset_cache = None
+
+    def __hash__(self):
+        return hash(self.digest())
+
+    def __eq__(self, other):
+        return isinstance(other, ConfigSpec) and self.digest() == other.digest()
+
+    def __repr__(self):
+        return f'ConfigSpec({self.values!r})'
+
+
+@functools.lru_cache(maxsize=CONFIG_CACHE_SIZE)
+def _cached_config(spec: ConfigSpec) -> Config:
+    return spec.build()
+
+
+def build_config(template: dict, base: Optional[Union[str, Path]] = None) -> Config:
+    return ConfigSpec.from_template(template, base).build()
+
+
+def load_template(path: Union[str, Path], assets: Optional[Union[str, Path]] = None) -> Config:
+    return ConfigSpec.load(path, assets).build()
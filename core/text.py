@@ -0,0 +1,127 @@
+import math
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Masks are kept by their size in pixels, a byte each: a 64pt header line is about 70 KB and mostly drawn
+# once, small_text and subheaders repeat and stay at the recent end
+MASK_CACHE_BYTES = 8 * 1024 * 1024
+
+MaskCacheInfo = namedtuple('MaskCacheInfo', ['hits', 'misses', 'entries', 'bytes', 'max_bytes'])
+
+_masks = OrderedDict()
+_masks_lock = threading.Lock()
+_mask_stats = {'hits': 0, 'misses': 0, 'bytes': 0}
+
+
+def text_mask(font: ImageFont.FreeTypeFont, text: str, mode: str, ink: int,
+              start: Tuple[float, float]) -> tuple:
+    # Fonts come from load_font, one object per (path, size), so the font stands for both in the key. The
+    # mask depends on the sub-pixel start of the text as well, not only on the string
+    key = (font, text, mode, ink, start)
+
+    with _masks_lock:
+        value = _masks.get(key)
+        if value is not None:
+            _masks.move_to_end(key)
+            _mask_stats['hits'] += 1
+            return value
+
+        _mask_stats['misses'] += 1
+
+    value = font.getmask2(text, mode, ink=ink, start=start)
+    size = value[0].size[0] * value[0].size[1]
+
+    if size > MASK_CACHE_BYTES:
+        return value
+
+    with _masks_lock:
+        if key not in _masks:
+            _masks[key] = value
+            _mask_stats['bytes'] += size
+
+        while _mask_stats['bytes'] > MASK_CACHE_BYTES:
+            _, (mask, _) = _masks.popitem(last=False)
+            _mask_stats['bytes'] -= mask.size[0] * mask.size[1]
+
+    return value
+
+
+def mask_cache_info() -> MaskCacheInfo:
+    with _masks_lock:
+        return MaskCacheInfo(_mask_stats['hits'], _mask_stats['misses'], len(_masks), _mask_stats['bytes'],
+                             MASK_CACHE_BYTES)
+
+
+def mask_cache_clear():
+    with _masks_lock:
+        _masks.clear()
+        _mask_stats.update(hits=0, misses=0, bytes=0)
+
+
+def _ink(draw: ImageDraw.ImageDraw, fill) -> Optional[int]:
+    ink, fill = draw._getink(fill)
+
+    return fill if ink is None else ink
+
+
+def _blend(draw: ImageDraw.ImageDraw, xy: Tuple[float, float], text: str, ink: int, font: ImageFont.FreeTypeFont):
+    start = (math.modf(xy[0])[0], math.modf(xy[1])[0])
+    mask, offset = text_mask(font, text, draw.fontmode, ink, start)
+
+    draw.draw.draw_bitmap((int(xy[0]) + offset[0], int(xy[1]) + offset[1]), mask, ink)
+
+
+# Reusing masks goes through Pillow internals: ImageDraw._getink, the core draw_bitmap and getmask2(start=),
+# checked against ImageDraw.text on Pillow 9.0.1 and 9.5.0. The first text a process draws is drawn both
+# ways as a probe; if the internals are missing or blend differently, every text goes through ImageDraw.text
+_reuse_masks: Optional[bool] = None
+
+
+def _can_reuse_masks(font: ImageFont.FreeTypeFont) -> bool:
+    global _reuse_masks
+
+    if _reuse_masks is None:
+        try:
+            images = [Image.new('RGB', (96, 48)) for _ in range(2)]
+            draws = [ImageDraw.Draw(image) for image in images]
+
+            draws[0].text((3.5, 2.25), 'Ag', '#ffffff', font=font)
+            _blend(draws[1], (3.5, 2.25), 'Ag', _ink(draws[1], '#ffffff'), font)
+
+            _reuse_masks = images[0].tobytes() == images[1].tobytes()
+        except (AttributeError, TypeError):
+            _reuse_masks = False
+
+    return _reuse_masks
+
+
+def _reusable(font: ImageFont.FreeTypeFont, text: str) -> bool:
+    return (isinstance(font, ImageFont.FreeTypeFont) and '\n' not in text and '\r' not in text
+            and _can_reuse_masks(font))
+
+
+def draw_text(draw: ImageDraw.ImageDraw, xy: Tuple[float, float], text: str, fill, font: ImageFont.FreeTypeFont):
+    # ImageDraw.text with the rasterised mask reused between calls: the same bitmap is blended the same way,
+    # the output is identical
+    if not _reusable(font, text):
+        return draw.text(xy, text, fill, font=font)
+
+    ink = _ink(draw, fill)
+    if ink is not None:
+        _blend(draw, xy, text, ink, font)
+
+
+def text_box(draw: ImageDraw.ImageDraw, xy: Tuple[float, float], text: str, fill,
+             font: ImageFont.FreeTypeFont) -> Tuple[int, int, int, int]:
+    # the pixels draw_text may touch: exactly the mask it blends, already cached for drawing it
+    if not _reusable(font, text):
+        return tuple(int(value) for value in draw.textbbox(xy, text, font=font))
+
+    start = (math.modf(xy[0])[0], math.modf(xy[1])[0])
+    mask, offset = text_mask(font, text, draw.fontmode, _ink(draw, fill), start)
+    left, top = int(xy[0]) + offset[0], int(xy[1]) + offset[1]
+
+    return left, top, left + mask.size[0], top + mask.size[1]
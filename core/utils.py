@@ -1,56 +1,155 @@
+import hashlib
+import math
+import os
 import textwrap
+from functools import lru_cache
 
 from PIL import Image, ImageFont
 from PIL.Image import Image as ImageType
 from pathlib import Path
+from typing import Union, Iterable, Optional, Tuple
 
+from core.coverage import coverage, runs_width
+from core.measure import get_measurer
 
-def resize(img: ImageType, scale: float) -> ImageType:
+FONT_CACHE_SIZE = 256
+FIT_CACHE_SIZE = 4096
+
+MAX_FONTSIZE = 1024
+
+
+def resize(img: ImageType, scale: float, resample: Optional[int] = None) -> ImageType:
     width, height = img.size
 
     return img.resize(
         (
             int(width * scale),
             int(height * scale)
-        )
+        ),
+        resample
     )
 
 
-def make_transparent(p: str or Path) -> ImageType:
-    image = Image.open(p).convert("RGBA")
+def image_size(source) -> Tuple[int, int]:
+    # a path only needs its header read
+    if isinstance(source, ImageType):
+        return source.size
+
+    with Image.open(source) as img:
+        return img.size
+
+
+def reduce_to(img: ImageType, size: Tuple[int, int]) -> ImageType:
+    # A JPEG that is not decoded yet is decoded straight at 1/2, 1/4 or 1/8 scale, anything else is shrunk by
+    # the largest integer factor with Image.reduce; a resize makes only the last, less than 2x step
+    if img.size == size:
+        return img
+
+    img.draft(img.mode, size)
+
+    factor = min(img.width // size[0], img.height // size[1])
+    if factor >= 2:
+        img = img.reduce(factor)
+
+    if img.size == size:
+        return img
+
+    return img.resize(size, Image.LANCZOS)
+
+
+@lru_cache(maxsize=64)
+def _file_digest(path: str, mtime_ns: int, size: int) -> str:
+    digest = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def file_digest(path: Union[str, Path]) -> str:
+    st = os.stat(path)
 
-    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
-        alpha = image.convert('RGBA').split()[-1]
-        image.putalpha(alpha)
+    return _file_digest(os.fspath(path), st.st_mtime_ns, st.st_size)
 
-    return image
 
+def image_digest(img: ImageType) -> str:
+    digest = hashlib.sha256(f'{img.mode}:{img.size}:'.encode())
+    digest.update(img.tobytes())
 
-def bruteforce(text, max_width, font, count=40):
+    return digest.hexdigest()
+
+
+def percentile(values: Iterable[float], q: float) -> Optional[float]:
+    ordered = sorted(values)
+    if not ordered:
+        return None
+
+    # nearest-rank
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def make_transparent(p: str or Path) -> ImageType:
+    # convert() already carries over the alpha channel or the palette's transparency
+    return Image.open(p).convert('RGBA')
+
+
+def bruteforce(text, max_width, font, count=40, exact=False):
+    measurer = get_measurer(font)
     lines = textwrap.wrap(text, width=count)
 
     final_text = []
 
     for line in lines:
-        width, height = font.getsize(line)
+        width = measurer.width(line, exact=exact)
 
         if width >= max_width:
-            return bruteforce(text, max_width, font, count - 10)
+            return bruteforce(text, max_width, font, count - 10, exact)
         else:
             final_text.append(line)
 
     return final_text
 
 
-def find_suitable_fontsize(max_width: int, font: ImageFont, text: str, max_letters: int = 40) -> ImageFont:
-    fontsize = 1
-    font = ImageFont.truetype(font.path, fontsize)
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def load_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(path, size)
+
+
+@lru_cache(maxsize=FIT_CACHE_SIZE)
+def _fit_fontsize(path: str, max_width: int, text: str, fallbacks: Optional[Tuple[str, ...]] = None) -> int:
+    if fallbacks is not None:
+        coverages = [coverage(font) for font in (path,) + fallbacks]
+
+    def fits(fontsize: int) -> bool:
+        if fallbacks is not None:
+            fonts = [load_font(font, fontsize) for font in (path,) + fallbacks]
+            return runs_width(text, fonts, coverages) < max_width
+
+        return load_font(path, fontsize).getsize(text)[0] < max_width
+
+    # find the first size that doesn't fit: double until we overshoot, then bisect
+    low, high = 0, 1
+    while high < MAX_FONTSIZE and fits(high):
+        low, high = high, min(high * 2, MAX_FONTSIZE)
+
+    while high - low > 1:
+        middle = (low + high) // 2
+        if fits(middle):
+            low = middle
+        else:
+            high = middle
+
+    return max(low, 1)
+
 
-    while font.getsize(text[0:max_letters])[0] < max_width:
-        # iterate until the text size is just larger than the criteria
-        fontsize += 1
-        font = ImageFont.truetype(font.path, fontsize)
+def find_suitable_fontsize(max_width: int, font: Union[ImageFont.FreeTypeFont, str, Path], text: str,
+                           max_letters: int = 40, fallbacks: Optional[Iterable[str]] = None) -> ImageFont:
+    # font: a font or the path of one, only its file is used
+    # fallbacks: font paths for what font has no glyphs for, the text is fitted as it is drawn along them
+    path = str(font) if isinstance(font, (str, Path)) else font.path
+    if fallbacks is not None:
+        fallbacks = tuple(str(fallback) for fallback in fallbacks)
 
-    # optionally de-increment to be sure it is less than criteria
-    fontsize -= 1
-    return ImageFont.truetype(font.path, fontsize)
+    return load_font(path, _fit_fontsize(path, max_width, text[0:max_letters], fallbacks))
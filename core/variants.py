@@ -0,0 +1,127 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from PIL import Image
+from PIL.Image import Image as ImageType
+
+from core.encoding import EncoderOptions, encode
+
+ENCODE_THREADS = min(4, os.cpu_count() or 1)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class Variant:
+    # One output of a render: the full canvas when width is None, a downscale keeping the aspect when only
+    # width is set, or a centre crop covering width x height
+    name: str
+    width: Optional[int]
+    height: Optional[int]
+    options: EncoderOptions
+
+    def __init__(self, name: str, width: Optional[int] = None, height: Optional[int] = None,
+                 options: Optional[EncoderOptions] = None):
+        if width is None and height is not None:
+            raise ValueError('a variant with a height needs a width')
+
+        self.name = name
+        self.width = width
+        self.height = height
+        self.options = options or EncoderOptions()
+
+    def geometry(self, size: Tuple[int, int]) -> Tuple[Tuple[int, int], Tuple[float, float, float, float]]:
+        # target size and the box of the full canvas it is taken from
+        width, height = size
+
+        if self.width is None:
+            return size, (0, 0, width, height)
+
+        if self.height is None:
+            return (self.width, max(1, round(height * self.width / width))), (0, 0, width, height)
+
+        scale = max(self.width / width, self.height / height)
+        crop_width, crop_height = self.width / scale, self.height / scale
+        left, top = (width - crop_width) / 2, (height - crop_height) / 2
+
+        return (self.width, self.height), (left, top, left + crop_width, top + crop_height)
+
+    def key(self) -> list:
+        return [self.width, self.height]
+
+    def __repr__(self):
+        return f'Variant({self.name!r}, {self.width!r}, {self.height!r}, {self.options.format!r})'
+
+
+PRESETS = {
+    'full': Variant('full'),
+    'og': Variant('og', 1200, 630),
+    'twitter': Variant('twitter', 1200, 600),
+    'thumbnail': Variant('thumbnail', 320),
+}
+
+
+def _scale_box(box: tuple, scale: float) -> tuple:
+    return tuple(value * scale for value in box)
+
+
+def iter_derived(image: ImageType, variants: Iterable[Variant]) -> Iterator[Tuple[Variant, ImageType]]:
+    # Largest first. Each variant starts from the smallest earlier downscale that still covers it, an integer
+    # Image.reduce does the bulk of the shrinking and a resize only the last, less than 2x step
+    sources: List[ImageType] = [image]
+
+    for variant in sorted(variants, key=lambda v: -v.geometry(image.size)[0][0]):
+        (width, height), box = variant.geometry(image.size)
+
+        if (width, height) == image.size:
+            yield variant, image
+            continue
+
+        # the full canvas always qualifies, so there is always a source
+        covering = [s for s in sources
+                    if s.width * (box[2] - box[0]) / image.width >= width
+                    and s.height * (box[3] - box[1]) / image.height >= height]
+        source = min(covering or [image], key=lambda s: s.width)
+        source_box = _scale_box(box, source.width / image.width)
+
+        factor = int(min((source_box[2] - source_box[0]) / width, (source_box[3] - source_box[1]) / height))
+        if factor >= 2:
+            reduce_box = tuple(int(round(value)) for value in source_box)
+            source = source.reduce(factor, box=reduce_box)
+            source_box = (0, 0, source.width, source.height)
+
+            if variant.height is None:
+                sources.append(source)
+
+        if source.size != (width, height) or source_box != (0, 0, source.width, source.height):
+            source = source.resize((width, height), Image.LANCZOS, box=source_box)
+
+            if variant.height is None:
+                sources.append(source)
+
+        yield variant, source
+
+
+def derive(image: ImageType, variants: Iterable[Variant]) -> Dict[str, ImageType]:
+    return {variant.name: derived for variant, derived in iter_derived(image, variants)}
+
+
+def executor() -> ThreadPoolExecutor:
+    # Pillow drops the GIL while resampling and encoding, threads are enough to encode variants in parallel
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=ENCODE_THREADS, thread_name_prefix='encode')
+
+    return _executor
+
+
+def encode_variants(image: ImageType, variants: Iterable[Variant]) -> Dict[str, bytes]:
+    # each variant is handed to an encoder thread as soon as it is derived, while the next one is resized
+    futures = {variant.name: executor().submit(encode, derived, variant.options)
+               for variant, derived in iter_derived(image, variants)}
+
+    return {name: future.result() for name, future in futures.items()}
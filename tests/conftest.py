@@ -1,24 +1,20 @@
 import os
 import pytest
-import numpy as np
 import shutil
 
-from PIL import Image
 from pathlib import Path
 
+from tests.regression import compare
 
-def assert_images_equal(image_1: str, image_2: str):
-    img1 = Image.open(image_1)
-    img2 = Image.open(image_2)
 
-    sum_sq_diff = np.sum((np.asarray(img1).astype('float') - np.asarray(img2).astype('float')) ** 2)
+def assert_images_equal(image_1: str, image_2: str, diff_dir: str = None):
+    result = compare(image_1, image_2, diff_dir=diff_dir)
 
-    if sum_sq_diff == 0:
-        # Images are exactly the same
-        pass
-    else:
-        normalized_sum_sq_diff = sum_sq_diff / np.sqrt(sum_sq_diff)
-        assert normalized_sum_sq_diff < 0.001
+    assert result, f'{image_2} differs from {image_1}: {result.reason}'
+
+
+def pytest_addoption(parser):
+    parser.addoption('--diff-dir', help='Write a heatmap of every baseline image mismatch here')
 
 
 @pytest.fixture
@@ -35,4 +31,4 @@ def image_similarity(request, tmpdir):
         shutil.copyfile(generated_file, target_file)
         pass
 
-    assert_images_equal(str(target_file), generated_file)
+    assert_images_equal(str(target_file), generated_file, request.config.getoption('diff_dir'))
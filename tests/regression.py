@@ -0,0 +1,181 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+# Golden image comparison. Images are compared as they decode, uint8, band by band of TILE rows: equal bands
+# are a memcmp, the first differing one ends the check unless the caller asks for every differing tile (for
+# a heatmap). An optional difference hash rejects images that are visibly different before any pixel work
+
+TILE = 64
+HASH_SIZE = 8
+HASH_DISTANCE = 4
+
+PathLike = Union[str, Path]
+
+
+class Comparison:
+    expected: str
+    actual: str
+    equal: bool
+    reason: Optional[str]
+    tiles: List[Tuple[int, int]]
+
+    def __init__(self, expected: PathLike, actual: PathLike, equal: bool, reason: Optional[str] = None,
+                 tiles: Optional[List[Tuple[int, int]]] = None):
+        self.expected = str(expected)
+        self.actual = str(actual)
+        self.equal = equal
+        self.reason = reason
+        self.tiles = tiles or []
+
+    def __bool__(self):
+        return self.equal
+
+    def __repr__(self):
+        return f'Comparison({self.actual!r}, equal={self.equal!r}, reason={self.reason!r})'
+
+
+def load(path: PathLike) -> np.ndarray:
+    with Image.open(path) as image:
+        return np.asarray(image)
+
+
+def dhash(array: np.ndarray) -> int:
+    # one bit per horizontal gradient of a (HASH_SIZE + 1) x HASH_SIZE greyscale thumbnail
+    image = Image.fromarray(array).convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.BOX)
+    pixels = np.asarray(image, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hash_distance(array_1: np.ndarray, array_2: np.ndarray) -> int:
+    return bin(dhash(array_1) ^ dhash(array_2)).count('1')
+
+
+def differing_tiles(expected: np.ndarray, actual: np.ndarray, tile: int = TILE,
+                    first: bool = False) -> List[Tuple[int, int]]:
+    # (top, left) of every tile x tile square that differs, or only the first one
+    tiles = []
+    height, width = expected.shape[:2]
+
+    for top in range(0, height, tile):
+        band_1, band_2 = expected[top:top + tile], actual[top:top + tile]
+        if np.array_equal(band_1, band_2):
+            continue
+
+        for left in range(0, width, tile):
+            if not np.array_equal(band_1[:, left:left + tile], band_2[:, left:left + tile]):
+                tiles.append((top, left))
+
+                if first:
+                    return tiles
+
+    return tiles
+
+
+def compare(expected: PathLike, actual: PathLike, tile: int = TILE, prefilter: bool = False,
+            full: bool = False, diff_dir: Optional[PathLike] = None) -> Comparison:
+    array_1, array_2 = load(expected), load(actual)
+
+    if array_1.shape != array_2.shape:
+        return Comparison(expected, actual, False, f'shape {array_2.shape} != {array_1.shape}')
+
+    if prefilter:
+        distance = hash_distance(array_1, array_2)
+
+        if distance > HASH_DISTANCE:
+            result = Comparison(expected, actual, False, f'perceptual hashes {distance} bits apart')
+            write_heatmap(result, diff_dir, array_1, array_2)
+            return result
+
+    tiles = differing_tiles(array_1, array_2, tile, first=not (full or diff_dir is not None))
+    if not tiles:
+        return Comparison(expected, actual, True)
+
+    result = Comparison(expected, actual, False, f'tile at {tiles[0]} differs', tiles)
+    write_heatmap(result, diff_dir, array_1, array_2)
+
+    return result
+
+
+def heatmap(expected: np.ndarray, actual: np.ndarray) -> Image.Image:
+    # the expected image dimmed to grey, differing pixels in red by the size of the largest channel error
+    difference = np.abs(expected.astype(np.int16) - actual.astype(np.int16))
+    if difference.ndim == 3:
+        difference = difference.max(axis=2)
+
+    error = np.zeros(difference.shape + (3,), dtype=np.uint8)
+    error[..., 0] = np.clip(difference.astype(np.int32) * 4 + (difference > 0) * 64, 0, 255)
+
+    grey = np.asarray(Image.fromarray(expected).convert('L'), dtype=np.uint8) // 3
+    background = np.repeat(grey[..., None], 3, axis=2)
+
+    return Image.fromarray(np.where(difference[..., None] > 0, error, background))
+
+
+def write_heatmap(result: Comparison, diff_dir: Optional[PathLike], expected: np.ndarray, actual: np.ndarray):
+    if diff_dir is None or expected.shape != actual.shape:
+        return
+
+    os.makedirs(diff_dir, exist_ok=True)
+    heatmap(expected, actual).save(Path(diff_dir) / f'{Path(result.actual).stem}.diff.png')
+
+
+def compare_many(pairs: Iterable[Tuple[PathLike, PathLike]], workers: Optional[int] = None,
+                 **kwargs) -> List[Comparison]:
+    # decoding and numpy comparisons release the GIL, threads are enough
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        return list(executor.map(lambda pair: compare(*pair, **kwargs), pairs))
+
+
+def compare_dirs(expected_dir: PathLike, actual_dir: PathLike, workers: Optional[int] = None,
+                 **kwargs) -> List[Comparison]:
+    # every golden image in expected_dir against the file of the same name in actual_dir
+    expected_dir, actual_dir = Path(expected_dir), Path(actual_dir)
+    names = sorted(path.name for path in expected_dir.iterdir() if path.is_file())
+
+    missing = [Comparison(expected_dir / name, actual_dir / name, False, 'missing')
+               for name in names if not (actual_dir / name).exists()]
+    pairs = [(expected_dir / name, actual_dir / name) for name in names if (actual_dir / name).exists()]
+
+    return missing + compare_many(pairs, workers, **kwargs)
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(prog='python -m tests.regression',
+                                 description='Compare rendered banners against golden images')
+
+    ap.add_argument('expected', help='Directory of golden images')
+    ap.add_argument('actual', help='Directory of rendered images with the same names')
+    ap.add_argument('-j', '--workers', type=int,
+                    help='Comparison threads, defaults to the CPU count')
+    ap.add_argument('--tile', type=int, default=TILE,
+                    help='Tile size in pixels')
+    ap.add_argument('--prefilter', action='store_true',
+                    help='Reject visibly different images by perceptual hash first')
+    ap.add_argument('--diff-dir',
+                    help='Write a heatmap for every mismatch here')
+
+    args = ap.parse_args(args)
+
+    results = compare_dirs(args.expected, args.actual, args.workers, tile=args.tile, prefilter=args.prefilter,
+                           diff_dir=args.diff_dir)
+    failed = [result for result in results if not result]
+
+    for result in failed:
+        print(f'{result.actual}: {result.reason}', file=sys.stderr)
+
+    print(f'{len(results) - len(failed)} of {len(results)} images match')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from core import GeneratorFactory
+
+from tests.helpers import assert_same, make_config, records, banner
+
+
+class SlowGenerator:
+    # stands in for a BannerGenerator, records how many renders overlap
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.running = 0
+        self.peak = 0
+        self.finished = 0
+        self.lock = threading.Lock()
+
+    def generate(self, header, main_text, subheader=None, small_text=None):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+
+        time.sleep(self.seconds)
+
+        with self.lock:
+            self.running -= 1
+            self.finished += 1
+
+        return header
+
+
+def test_async_renders_match_sync():
+    generator = GeneratorFactory.banner(make_config())
+    renderer = generator.aio(concurrency=2)
+
+    async def main():
+        return await asyncio.gather(renderer.agenerate(**banner), renderer.agenerate_bytes(**banner))
+
+    image, data = asyncio.run(main())
+    renderer.close()
+
+    assert_same(image, generator.generate(**banner))
+    assert data == bytes(generator.generate_bytes(**banner))
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_agenerate_many_streams_every_record(ordered):
+    items = records()
+    generator = GeneratorFactory.banner(make_config())
+    renderer = generator.aio(concurrency=2)
+
+    async def main():
+        return [result async for result in renderer.agenerate_many(items, ordered=ordered)]
+
+    results = asyncio.run(main())
+    renderer.close()
+
+    assert sorted(index for index, _ in results) == list(range(len(items)))
+    if ordered:
+        assert [index for index, _ in results] == list(range(len(items)))
+
+    for index, image in results[:3]:
+        assert_same(image, generator.generate(**items[index]))
+
+
+def test_concurrency_is_bounded_through_timeouts():
+    from core.aio import AsyncBannerGenerator
+
+    slow = SlowGenerator(0.1)
+    renderer = AsyncBannerGenerator(slow, concurrency=2)
+
+    async def main():
+        calls = [renderer.agenerate(str(i), '', timeout=0.02) for i in range(3)]
+        results = await asyncio.gather(*calls, return_exceptions=True)
+
+        # timed out callers are gone, their renders still hold the slots until they end
+        assert all(isinstance(result, asyncio.TimeoutError) for result in results)
+        assert await renderer.agenerate('after', '') == 'after'
+
+    asyncio.run(main())
+    renderer.close()
+
+    assert slow.peak == 2
+
+
+def test_cancelled_batch_stops_submitting():
+    from core.aio import AsyncBannerGenerator
+
+    slow = SlowGenerator(0.01)
+    renderer = AsyncBannerGenerator(slow, concurrency=1)
+
+    async def main():
+        async for index, _ in renderer.agenerate_many({'header': str(i), 'main_text': ''} for i in range(1000)):
+            if index == 2:
+                break
+
+    asyncio.run(main())
+    renderer.close()
+
+    assert slow.finished < 10
+
+
+def test_process_pools_are_rejected():
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        with pytest.raises(TypeError, match='ThreadPoolExecutor'):
+            GeneratorFactory.banner(make_config()).aio(executor=executor)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from PIL import Image
+from core import GeneratorFactory
+from core.assets import AssetCache, prepare
+from core.template import ConfigSpec
+from core.utils import make_transparent
+
+from tests.helpers import banner, template, sub_image, sub_image_path, logo_first_part_path
+
+
+def test_make_transparent_keeps_alpha():
+    image = make_transparent(sub_image_path)
+
+    assert image.mode == 'RGBA'
+    assert np.array_equal(np.asarray(image), np.asarray(Image.open(sub_image_path).convert('RGBA')))
+
+
+def test_cached_asset_matches_prepared(tmpdir):
+    assets = AssetCache(tmpdir)
+
+    first = assets.load(sub_image_path, transparent=True, scale=0.45)
+    second = assets.load(sub_image_path, transparent=True, scale=0.45)
+
+    assert assets.misses == 1 and assets.hits == 1
+    assert second.mode == 'RGBA' and second.size == sub_image.size
+    assert np.array_equal(np.asarray(first), np.asarray(sub_image))
+    assert np.array_equal(np.asarray(second), np.asarray(sub_image))
+
+    # a fresh process sees the same entry
+    assert AssetCache(tmpdir).load(sub_image_path, transparent=True, scale=0.45).size == sub_image.size
+
+
+def test_asset_key_follows_transform(tmpdir):
+    assets = AssetCache(tmpdir)
+
+    assets.load(logo_first_part_path, transparent=True, scale=0.2)
+    lanczos = assets.load(logo_first_part_path, transparent=True, scale=0.2, resample='lanczos')
+    premultiplied = assets.load(logo_first_part_path, transparent=True, scale=0.2, premultiplied=True)
+
+    assert assets.misses == 3 and len(tmpdir.listdir()) == 3
+    assert np.array_equal(np.asarray(lanczos),
+                          np.asarray(prepare(logo_first_part_path, True, 0.2, resample='lanczos')))
+
+    assert premultiplied.mode == 'RGBa'
+    assert assets.load(logo_first_part_path, transparent=True, scale=0.2, premultiplied=True).mode == 'RGBa'
+
+    with pytest.raises(ValueError):
+        assets.load(logo_first_part_path, scale=0.2, resample='sinc')
+
+
+def test_spec_with_asset_cache_renders_the_same(tmpdir):
+    expected = bytes(GeneratorFactory.banner(ConfigSpec.load(template).build()).generate_bytes(**banner))
+
+    specs = []
+    for _ in range(2):
+        specs.append(ConfigSpec.load(template, assets=tmpdir))
+        config = specs[-1].build()
+        assert bytes(GeneratorFactory.banner(config).generate_bytes(**banner)) == expected
+
+    assert len(tmpdir.listdir()) == 3
+
+    # one cache per spec, counting all of its images
+    assert (specs[0].asset_cache.misses, specs[0].asset_cache.hits) == (3, 0)
+    assert (specs[1].asset_cache.misses, specs[1].asset_cache.hits) == (0, 3)
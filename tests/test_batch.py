@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import numpy as np
+from PIL import Image
+from core import GeneratorFactory, Recorder
+from core.batch import imap_bounded
+
+from tests.helpers import make_config, records, assert_same
+
+
+@pytest.mark.parametrize('threads', [False, True])
+@pytest.mark.parametrize('ordered', [True, False])
+def test_generate_many(ordered, threads):
+    config = make_config()
+    items = records()
+
+    results = list(GeneratorFactory.banner_many(config, items, workers=2, ordered=ordered, threads=threads))
+
+    assert sorted(index for index, _ in results) == list(range(len(items)))
+    if ordered:
+        assert [index for index, _ in results] == list(range(len(items)))
+
+    banner_factory = GeneratorFactory.banner(config)
+    for index, image in results:
+        assert_same(image, banner_factory.generate(**items[index]))
+
+
+def test_thread_batches_keep_their_own_generator():
+    items = records()
+    generator_1 = GeneratorFactory.banner(make_config(), instrument=Recorder())
+    generator_2 = GeneratorFactory.banner(make_config(site='example.org'))
+
+    batch_1 = generator_1.generate_many(items, workers=2, threads=True)
+    batch_2 = generator_2.generate_many(items, workers=2, threads=True)
+
+    results_1, results_2 = [], []
+    for result_1, result_2 in zip(batch_1, batch_2):
+        results_1.append(result_1)
+        results_2.append(result_2)
+
+    for (index, image_1), (_, image_2) in zip(results_1, results_2):
+        assert_same(image_1, GeneratorFactory.banner(make_config()).generate(**items[index]))
+        assert_same(image_2, GeneratorFactory.banner(make_config(site='example.org')).generate(**items[index]))
+
+    # the batch ran on the caller's generator, not on a copy
+    assert generator_1.instrument.counters['banners'] == len(items)
+
+
+def test_generate_many_files(tmpdir):
+    config = make_config()
+    items = [dict(anime, fp=str(tmpdir / f'{i}.png')) for i, anime in enumerate(records())]
+
+    results = list(GeneratorFactory.banner(config).generate_many_files(items, workers=2))
+
+    assert [fp for _, fp in results] == [item['fp'] for item in items]
+
+    banner_factory = GeneratorFactory.banner(config)
+    for item in items:
+        fields = {key: value for key, value in item.items() if key != 'fp'}
+        assert_same(Image.open(item['fp']), banner_factory.generate(**fields))
+
+
+def test_generate_does_not_touch_background():
+    config = make_config()
+    before = np.asarray(config.background).copy()
+
+    banner_factory = GeneratorFactory.banner(config)
+    first = banner_factory.generate(header='Steins;Gate', main_text='#3 anime in history')
+    banner_factory.generate(header='Gintama°', main_text='#2 anime in history')
+
+    assert np.array_equal(np.asarray(config.background), before)
+    assert_same(first, banner_factory.generate(header='Steins;Gate', main_text='#3 anime in history'))
+
+
+def test_input_error_comes_after_submitted_items():
+    def items():
+        yield from range(3)
+        raise ValueError('torn input')
+
+    results = []
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with pytest.raises(ValueError, match='torn input'):
+            for result in imap_bounded(executor, lambda item: item * 2, items(), window=8, ordered=False):
+                results.append(result)
+
+    assert sorted(results) == [(0, 0), (1, 2), (2, 4)]
@@ -0,0 +1,121 @@
+import os
+import numpy as np
+from PIL import Image
+from core import GeneratorFactory, RenderCache
+
+from tests.helpers import make_config, banner
+
+
+
+def test_generate_file_hit_copies_previous_output(tmpdir):
+    cache = RenderCache(tmpdir / 'cache')
+    banner_factory = GeneratorFactory.banner(make_config(), cache=cache)
+
+    banner_factory.generate_file(str(tmpdir / 'first.jpg'), **banner)
+    assert cache.stats()['misses'] == 1 and cache.stats()['entries'] == 1
+
+    banner_factory = GeneratorFactory.banner(make_config(), cache=cache)
+    banner_factory.generate_file(str(tmpdir / 'second.jpg'), **banner)
+    assert cache.stats()['hits'] == 1 and cache.stats()['entries'] == 1
+
+    GeneratorFactory.banner(make_config()).generate_file(str(tmpdir / 'plain.jpg'), **banner)
+    with open(tmpdir / 'plain.jpg', 'rb') as plain, open(tmpdir / 'second.jpg', 'rb') as cached:
+        assert plain.read() == cached.read()
+
+    # outputs are files of their own, writing one again doesn't touch the entry
+    assert os.stat(tmpdir / 'second.jpg').st_nlink == 1
+    assert os.stat(tmpdir / 'second.jpg').st_mode & 0o200
+
+    GeneratorFactory.banner(make_config()).generate_file(str(tmpdir / 'second.jpg'), **dict(banner, main_text='#1'))
+    banner_factory.generate_file(str(tmpdir / 'third.jpg'), **banner)
+    with open(tmpdir / 'plain.jpg', 'rb') as plain, open(tmpdir / 'third.jpg', 'rb') as cached:
+        assert plain.read() == cached.read()
+
+
+def test_generate_file_hit_can_hard_link(tmpdir):
+    cache = RenderCache(tmpdir / 'cache', hard_links=True)
+    banner_factory = GeneratorFactory.banner(make_config(), cache=cache)
+
+    banner_factory.generate_file(str(tmpdir / 'first.jpg'), **banner)
+    banner_factory.generate_file(str(tmpdir / 'second.jpg'), **banner)
+
+    first = os.stat(tmpdir / 'first.jpg')
+    second = os.stat(tmpdir / 'second.jpg')
+    assert (first.st_ino, first.st_dev) == (second.st_ino, second.st_dev)
+
+
+def test_generate_hit_returns_same_image(tmpdir):
+    cache = RenderCache(tmpdir)
+    banner_factory = GeneratorFactory.banner(make_config(), cache=cache)
+
+    rendered = banner_factory.generate(**banner)
+    cached = banner_factory.generate(**banner)
+
+    assert cache.hits == 1 and cache.misses == 1
+    assert np.array_equal(np.asarray(rendered), np.asarray(cached))
+
+
+def test_key_covers_fields_format_and_config(tmpdir):
+    cache = RenderCache(tmpdir / 'cache')
+    banner_factory = GeneratorFactory.banner(make_config(), cache=cache)
+
+    banner_factory.generate_file(str(tmpdir / 'a.jpg'), **banner)
+    banner_factory.generate_file(str(tmpdir / 'a.png'), **banner)
+    banner_factory.generate_file(str(tmpdir / 'b.jpg'), **dict(banner, small_text='по данным'))
+
+    config = make_config()
+    config.site = 'example.com'
+    GeneratorFactory.banner(config, cache=cache).generate_file(str(tmpdir / 'c.jpg'), **banner)
+
+    assert cache.hits == 0 and cache.misses == 4
+    assert Image.open(str(tmpdir / 'a.png')).format == 'PNG'
+
+
+def test_eviction_keeps_cache_bounded(tmpdir):
+    cache = RenderCache(tmpdir / 'cache', max_bytes=1)
+    banner_factory = GeneratorFactory.banner(make_config(), cache=cache)
+
+    for i in range(3):
+        banner_factory.generate_file(str(tmpdir / f'{i}.jpg'), **dict(banner, main_text=f'#{i} anime'))
+        assert os.path.exists(tmpdir / f'{i}.jpg')
+
+    assert cache.evictions == 2
+    assert cache.stats()['entries'] == 1
+
+    banner_factory.generate_file(str(tmpdir / 'again.jpg'), **dict(banner, main_text='#2 anime'))
+    assert cache.hits == 1
+    banner_factory.generate_file(str(tmpdir / 'again.jpg'), **dict(banner, main_text='#0 anime'))
+    assert cache.hits == 1 and cache.misses == 4
+
+    cache = RenderCache(tmpdir / 'reopened', max_bytes=10 ** 9)
+    GeneratorFactory.banner(make_config(), cache=cache).generate_file(str(tmpdir / 'd.jpg'), **banner)
+    assert RenderCache(tmpdir / 'reopened').stats()['entries'] == 1
+
+
+def test_worker_processes_share_budget_and_counts(tmpdir):
+    cache = RenderCache(tmpdir / 'cache', max_bytes=300_000)
+    banner_factory = GeneratorFactory.banner(make_config(), cache=cache)
+    items = [dict(banner, main_text=f'#{i} anime', fp=str(tmpdir / f'{i}.jpg')) for i in range(8)]
+
+    list(banner_factory.generate_many_files(items, workers=2))
+    list(banner_factory.generate_many_files(items[-1:], workers=2))
+
+    entries = [path for path in (tmpdir / 'cache').visit() if path.isfile() and not path.basename.startswith('.')]
+    assert sum(path.size() for path in entries) <= 300_000
+    assert cache.stats()['bytes'] <= 300_000
+
+    assert cache.misses == 8 and cache.hits == 1
+    assert cache.evictions > 0
+
+
+def test_size_and_vanished_entries(tmpdir):
+    cache = RenderCache(tmpdir / 'cache')
+    path = cache.put('ab' * 32, '.bin', b'x' * 1000)
+
+    assert (tmpdir / 'cache' / '.size').read() == '1000'
+
+    # evicted by another process between the lookup and the copy
+    os.unlink(path)
+    assert not cache.export('ab' * 32, '.bin', str(tmpdir / 'out.bin'))
+    assert cache.read('ab' * 32, '.bin') is None
+    assert cache.misses == 2 and cache.hits == 0
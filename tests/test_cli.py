@@ -0,0 +1,117 @@
+import json
+import os
+import numpy as np
+import pytest
+from PIL import Image
+from core import GeneratorFactory
+from core.cli import main, map_record, DEFAULT_MAPPING
+
+from tests.helpers import make_config, average_anime, shortest_anime
+
+template = os.path.join('example', 'template.json')
+
+
+def write_records(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+
+
+def read_manifest(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_map_record_defaults():
+    assert map_record(average_anime[1], DEFAULT_MAPPING, 1) == {
+        'header': 'Gintama°', 'subheader': '銀魂°', 'main_text': '9.09'
+    }
+
+    mapping = dict(DEFAULT_MAPPING, main_text='#{n} аниме', small_text='по данным')
+    assert map_record(shortest_anime[0], mapping, 0) == {
+        'header': 'F', 'subheader': 'Ｆ-エフ', 'main_text': '#1 аниме', 'small_text': 'по данным'
+    }
+
+
+def test_render_jsonl(tmpdir):
+    records = str(tmpdir / 'records.jsonl')
+    write_records(records, average_anime[:4])
+
+    code = main([records, '-c', template, '-o', str(tmpdir / 'out'), '-w', '2',
+                 '-m', 'main_text=#{n} anime in history', '-n', '{n}.png'])
+    assert code == 0
+
+    manifest = read_manifest(tmpdir / 'out' / 'manifest.jsonl')
+    assert sorted(entry['index'] for entry in manifest) == [0, 1, 2, 3]
+    assert all(entry['status'] == 'ok' and entry['seconds'] > 0 for entry in manifest)
+
+    banner_factory = GeneratorFactory.banner(make_config())
+    for i, record in enumerate(average_anime[:4]):
+        expected = banner_factory.generate(header=record['name'], main_text=f'#{i + 1} anime in history',
+                                           subheader=json.loads(record['japanese_synonyms'])[0])
+        assert np.array_equal(np.asarray(Image.open(str(tmpdir / 'out' / f'{i + 1}.png'))), np.asarray(expected))
+
+
+def test_resume_skips_finished_records(tmpdir, capsys):
+    records = str(tmpdir / 'records.jsonl')
+    write_records(records, average_anime[:3])
+    args = [records, '-c', template, '-o', str(tmpdir / 'out'), '-w', '1']
+
+    assert main(args) == 0
+
+    os.remove(tmpdir / 'out' / '000001.jpg')
+    with open(tmpdir / 'out' / 'manifest.jsonl', 'a') as f:
+        f.write('{"index": 2, "out')
+
+    assert main(args) == 0
+    assert '1 rendered, 0 failed, 2 skipped' in capsys.readouterr().err
+    assert os.path.exists(tmpdir / 'out' / '000001.jpg')
+
+
+def test_bad_records_are_reported(tmpdir, monkeypatch, capsys):
+    records = str(tmpdir / 'records.jsonl')
+    write_records(records, shortest_anime[:2])
+    monkeypatch.setattr('sys.stdin', open(records, encoding='utf-8'))
+
+    # shortest_anime has no score, so the default main_text can't be built
+    assert main(['-', '-c', template, '-o', str(tmpdir / 'out'), '-w', '1']) == 1
+
+    manifest = read_manifest(tmpdir / 'out' / 'manifest.jsonl')
+    assert [entry['status'] for entry in manifest] == ['error', 'error']
+    assert 'main_text' in manifest[0]['error']
+    assert '0 rendered, 2 failed' in capsys.readouterr().err
+
+
+def test_bad_lines_do_not_stop_the_run(tmpdir, capsys):
+    records = str(tmpdir / 'records.jsonl')
+    with open(records, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(average_anime[0]) + '\n')
+        f.write('{"name": "torn\n')
+        f.write(json.dumps(dict(average_anime[1], name=None)) + '\n')
+        f.write(json.dumps(average_anime[2]) + '\n')
+
+    args = [records, '-c', template, '-o', str(tmpdir / 'out'), '-w', '1', '-n', '{name:.3}-{index}.jpg']
+    assert main(args) == 1
+
+    manifest = sorted(read_manifest(tmpdir / 'out' / 'manifest.jsonl'), key=lambda entry: entry['index'])
+    assert [entry['status'] for entry in manifest] == ['ok', 'error', 'error', 'ok']
+    assert 'bad JSON' in manifest[1]['error'] and 'file name' in manifest[2]['error']
+    assert '2 rendered, 2 failed' in capsys.readouterr().err
+
+    # the finished records are not rendered again
+    assert main(args) == 1
+    assert '0 rendered, 2 failed, 2 skipped' in capsys.readouterr().err
+
+
+def test_bad_output_extension_is_rejected_up_front(tmpdir, capsys):
+    records = str(tmpdir / 'records.jsonl')
+    write_records(records, average_anime[:2])
+
+    with pytest.raises(SystemExit):
+        main([records, '-c', template, '-o', str(tmpdir / 'out'), '-n', '{index}.bin', '-q', '80'])
+    assert 'unknown file extension' in capsys.readouterr().err
+
+    # an extension taken from the record fails that record only
+    code = main([records, '-c', template, '-o', str(tmpdir / 'out'), '-w', '1', '-n', '{index}.{name:.1}', '-q', '80'])
+    assert code == 1
+    assert [entry['status'] for entry in read_manifest(tmpdir / 'out' / 'manifest.jsonl')] == ['error', 'error']
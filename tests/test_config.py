@@ -0,0 +1,151 @@
+import pickle
+import subprocess
+import sys
+import pytest
+import numpy as np
+from PIL import Image
+from core import Config, GeneratorFactory, batch
+from core.template import ConfigSpec, load_template
+
+from core.utils import load_font, reduce_to
+
+from tests.helpers import background_path, make_config, banner, template, text_font, get_longest_anime
+
+
+def test_resources_load_on_first_use():
+    config = load_template(template)
+
+    assert 'background' not in vars(config) and 'sub_image' not in vars(config)
+    assert 'header_font' not in vars(config)
+
+    assert config.header_font.size == config.header_fontsize
+    assert 'header_font' in vars(config) and 'subheader_font' not in vars(config)
+
+    # the template's transformed images match the ones built by hand
+    assert np.array_equal(np.asarray(config.sub_image), np.asarray(make_config().sub_image))
+
+
+def test_unused_fonts_are_never_opened():
+    config = Config(text_font=text_font, small_text_font='missing.ttf')
+
+    assert config.text_font.path == str(text_font)
+
+
+def test_long_headers_skip_the_default_header_font():
+    config = load_template(template)
+    generator = GeneratorFactory.banner(config)
+    header = next(get_longest_anime())['header']
+    assert len(header) > 60
+
+    generator.layout(header, 'main text')
+    assert 'header_font' not in vars(config)
+
+    # an assigned font is fitted from its own file
+    config.header_font = load_font(str(text_font), 10)
+    plan = generator.layout(header, 'main text')
+    assert plan.header and all(item.font.path == str(text_font) for item in plan.header)
+
+
+def test_lazy_config_renders_and_hashes_the_same():
+    config = load_template(template)
+
+    assert config.fingerprint() == make_config().fingerprint()
+    assert 'header_font' not in vars(config)
+
+    data = GeneratorFactory.banner(config).generate_bytes(**banner)
+    assert bytes(data) == bytes(GeneratorFactory.banner(make_config()).generate_bytes(**banner))
+
+
+def test_package_import_is_deferred():
+    code = 'import sys, core; print("core.main" in sys.modules, "PIL.Image" in sys.modules, core.Config.__module__)'
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+
+    assert out.split() == ['False', 'False', 'core.main']
+
+
+@pytest.mark.parametrize('suffix', ['.json', '.toml'])
+def test_spec_roundtrip(tmpdir, suffix):
+    spec = ConfigSpec.load(template)
+    path = tmpdir / 'nested' / f'template{suffix}'
+    path.dirpath().ensure(dir=True)
+
+    spec.save(path)
+    loaded = ConfigSpec.load(path)
+
+    assert loaded == spec and loaded.values == spec.values
+    assert loaded.build().fingerprint() == make_config().fingerprint()
+
+
+def test_spec_pickles_small_and_builds_once_per_process():
+    spec = ConfigSpec.load(template)
+    data = pickle.dumps(spec)
+
+    assert len(data) < 1024
+    assert pickle.loads(data).config() is spec.config()
+    assert spec.config().spec == spec
+    assert spec.build() is not spec.config()
+
+
+def test_spec_digest_follows_values():
+    spec = ConfigSpec.load(template)
+
+    assert ConfigSpec(dict(spec.values, padding=10)).digest() != spec.digest()
+    assert hash(ConfigSpec(dict(spec.values))) == hash(spec)
+
+    with pytest.raises(ValueError):
+        ConfigSpec(dict(spec.values, colour='#fff'))
+
+
+def test_workers_receive_the_spec():
+    config = load_template(template)
+
+    assert batch.worker_config(config) is config.spec
+    assert isinstance(batch.worker_config(make_config()), Config)
+
+    batch.init_worker(pickle.loads(pickle.dumps(config.spec)), None)
+    assert batch.render_bytes(dict(banner))[0] == bytes(GeneratorFactory.banner(config).generate_bytes(**banner))
+
+
+@pytest.fixture
+def large_background(tmpdir):
+    path = str(tmpdir / 'large.jpg')
+    with Image.open(background_path) as image:
+        image.resize((image.width * 4, image.height * 4)).save(path, quality=90)
+
+    return path
+
+
+def test_jpeg_is_decoded_at_reduced_scale(large_background):
+    image = Image.open(large_background)
+    reduced = reduce_to(image, (image.width // 4, image.height // 4))
+
+    # draft mode decoded it at a quarter of its size, no resampling left to do
+    assert reduced is image and image.size == (1280, 720)
+    assert reduce_to(Image.open(large_background).convert('RGB'), (1000, 562)).size == (1000, 562)
+
+
+def test_output_width_scales_images_and_layout(large_background):
+    config = make_config(background=large_background, output_width=640)
+    reference = make_config()
+
+    assert config.scale == 640 / 5120
+    assert config.background.size == (640, 360)
+    assert config.padding == round(reference.padding * config.scale)
+    assert config.header_font.size == round(reference.header_fontsize * config.scale)
+    assert config.logo_first_part.width == round(reference.logo_first_part.width * config.scale)
+
+    generator = GeneratorFactory.banner(config)
+    plan = generator.layout(**banner)
+
+    assert plan.size == (640, 360)
+    assert plan.header[0].position == (config.padding, config.padding - config.px(30))
+    assert generator.generate(**banner).size == (640, 360)
+
+    assert config.fingerprint() != reference.fingerprint()
+
+
+def test_default_output_width_keeps_the_background_size():
+    config = make_config()
+
+    assert config.scale == 1 and config.px(30) == 30
+    assert ConfigSpec(dict(ConfigSpec.load(template).values, output_width=640)).build().background.size == (640, 360)
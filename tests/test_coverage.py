@@ -0,0 +1,114 @@
+import os
+from types import SimpleNamespace
+import numpy as np
+from PIL import ImageFont
+from core import GeneratorFactory
+from core.coverage import Coverage, coverage, runs_width, split_runs
+from core.linebreak import break_lines
+from core.template import ConfigSpec
+from core.utils import load_font
+
+from tests.helpers import make_config, template, header_font, subheader_font, text_font
+
+title = 'HUNTER×HUNTER（ハンター×ハンター）'
+
+
+def make_coverage(chars: str) -> Coverage:
+    bits = bytearray(max(map(ord, chars)) // 8 + 1)
+    for char in chars:
+        bits[ord(char) >> 3] |= 1 << (ord(char) & 7)
+
+    return Coverage('test', bits)
+
+
+def test_coverage_matches_freetype():
+    font = ImageFont.truetype(str(text_font), 24)
+    missing = bytes(font.getmask('\U000F0000'))
+    index = coverage(str(text_font))
+
+    for char in 'AzЖё°×（ハ€→🙂':
+        assert (ord(char) in index) == (bytes(font.getmask(char)) != missing), char
+
+    assert coverage(str(text_font)) is index
+
+
+def test_runs_follow_the_chain():
+    primary, fallback = load_font(str(text_font), 20), load_font(str(header_font), 20)
+    coverages = [make_coverage('HUNTER'), make_coverage('×（）')]
+
+    # the katakana is in neither font and is dropped
+    assert split_runs(title, [primary, fallback], coverages) == [
+        ('HUNTER', primary), ('×', fallback), ('HUNTER', primary), ('（×）', fallback),
+    ]
+    assert split_runs('HUNTER ×', [primary, fallback], coverages) == [('HUNTER ', primary), ('×', fallback)]
+
+
+def test_fallback_leaves_covered_text_alone():
+    record = {'header': 'Gintama°', 'main_text': '#2 anime in history', 'subheader': 'Gintama', 'small_text': 'по данным'}
+
+    plain = GeneratorFactory.banner(make_config()).generate(**record)
+    chained = GeneratorFactory.banner(make_config(fallback_fonts=[header_font])).generate(**record)
+
+    assert np.array_equal(np.asarray(plain), np.asarray(chained))
+
+
+def test_chain_coverages_are_looked_up_once(monkeypatch):
+    config = make_config(fallback_fonts=[header_font])
+    record = {'header': title, 'main_text': '#9 anime in history', 'subheader': title, 'small_text': 'по данным'}
+    GeneratorFactory.banner(config).generate(**record)
+
+    # drawing and measuring again doesn't stat any font file
+    stats = []
+    monkeypatch.setattr('core.coverage.os', SimpleNamespace(stat=stats.append, fspath=os.fspath))
+    GeneratorFactory.banner(config).generate(**record)
+    assert stats == []
+
+    monkeypatch.undo()
+    assert config.chain_coverages(config.subheader_font) == [coverage(str(subheader_font)), coverage(str(header_font))]
+
+
+def test_uncovered_characters_are_left_out():
+    banner_factory = GeneratorFactory.banner(make_config(subheader_font=text_font, fallback_fonts=[]))
+    record = {'header': 'Hunter x Hunter', 'main_text': '#9 anime in history'}
+
+    image = banner_factory.generate(**record, subheader='Hunter ハンター')
+    expected = banner_factory.generate(**record, subheader='Hunter ')
+
+    assert np.array_equal(np.asarray(image), np.asarray(expected))
+
+    renderer = banner_factory.incremental()
+    renderer.render(**record, subheader='Hunter')
+    assert np.array_equal(np.asarray(renderer.render(**record, subheader='Hunter ハンター')), np.asarray(expected))
+
+
+def test_wrapping_measures_what_is_drawn():
+    font = load_font(str(header_font), 64)
+
+    # none of it is drawn without a font that has katakana, so there is nothing to wrap
+    assert break_lines('ハンター' * 10, 300, font) != ['ハンター' * 10]
+    assert break_lines('ハンター' * 10, 300, font, fallbacks=[]) == ['ハンター' * 10]
+
+
+def test_header_fits_with_a_fallback_for_its_script():
+    # the header font has no kana, the fallback draws them
+    config = make_config(fallback_fonts=[subheader_font])
+    banner_factory = GeneratorFactory.banner(config)
+
+    plan = banner_factory.layout(header='ハンター×ハンター 劇場版 緋色の幻影 ファントム・ルージュ', main_text='#9 anime')
+
+    for item in plan.header:
+        assert runs_width(item.text, config.font_chain(item.font)) < config.max_header_width
+
+
+def test_fallback_fonts_in_templates(tmpdir):
+    spec = ConfigSpec.load(template)
+    chained = ConfigSpec(dict(spec.values, fallback_fonts=[str(header_font)]))
+
+    assert chained.digest() != spec.digest()
+
+    for suffix in ('.json', '.toml'):
+        path = tmpdir / f'template{suffix}'
+        chained.save(path)
+
+        assert ConfigSpec.load(path) == chained
+        assert ConfigSpec.load(path).build().fallback_fonts == chained.values['fallback_fonts']
@@ -0,0 +1,92 @@
+import io
+import pytest
+import numpy as np
+from PIL import Image
+from core import GeneratorFactory, RenderCache, EncoderOptions, available_formats
+
+from tests.helpers import make_config, banner, background_path
+
+
+def test_generate_bytes_matches_generate_file(tmpdir):
+    banner_factory = GeneratorFactory.banner(make_config())
+
+    data = banner_factory.generate_bytes(**banner)
+    banner_factory.generate_file(str(tmpdir / 'banner.jpg'), **banner)
+
+    assert isinstance(data, memoryview)
+    with open(tmpdir / 'banner.jpg', 'rb') as f:
+        assert bytes(data) == f.read()
+
+
+@pytest.mark.parametrize('options', [None, EncoderOptions(quality=80)])
+def test_rgba_banners_encode_the_same_into_files(tmpdir, options):
+    background = Image.open(background_path).convert('RGBA')
+    banner_factory = GeneratorFactory.banner(make_config(background=background))
+
+    banner_factory.generate_file(str(tmpdir / 'banner.jpg'), **banner, options=options)
+
+    with open(tmpdir / 'banner.jpg', 'rb') as f:
+        assert f.read() == bytes(banner_factory.generate_bytes(**banner, options=options))
+
+
+def test_generate_into_appends_to_buffer():
+    banner_factory = GeneratorFactory.banner(make_config())
+    buffer = io.BytesIO()
+    buffer.write(b'header')
+
+    data = banner_factory.generate_into(buffer, options=EncoderOptions(format='PNG'), **banner)
+
+    assert buffer.getvalue()[:6] == b'header'
+    assert bytes(data) == buffer.getvalue()[6:]
+    assert np.array_equal(np.asarray(Image.open(io.BytesIO(data))), np.asarray(banner_factory.generate(**banner)))
+
+
+def test_jpeg_options():
+    banner_factory = GeneratorFactory.banner(make_config())
+
+    small = banner_factory.generate_bytes(**banner, options=EncoderOptions(quality=30, subsampling=2))
+    large = banner_factory.generate_bytes(**banner, options=EncoderOptions(quality=95, subsampling=0))
+    progressive = banner_factory.generate_bytes(**banner, options=EncoderOptions(progressive=True, optimize=True))
+
+    assert len(small) < len(large)
+    assert Image.open(io.BytesIO(progressive)).info.get('progressive') == 1
+
+
+@pytest.mark.skipif('WEBP' not in available_formats(), reason='Pillow built without WebP')
+def test_webp_lossless():
+    banner_factory = GeneratorFactory.banner(make_config())
+
+    data = banner_factory.generate_bytes(**banner, options=EncoderOptions(format='webp', lossless=True))
+
+    image = Image.open(io.BytesIO(data))
+    assert image.format == 'WEBP'
+    assert np.array_equal(np.asarray(image.convert('RGB')), np.asarray(banner_factory.generate(**banner)))
+
+
+def test_unavailable_format():
+    with pytest.raises(ValueError):
+        GeneratorFactory.banner(make_config()).generate_bytes(**banner, options=EncoderOptions(format='NOPE'))
+
+
+@pytest.mark.parametrize('options', [
+    {'quality': 'x'}, {'quality': 101}, {'quality': True}, {'progressive': 'yes'}, {'subsampling': '4:1:1'},
+    {'format': 'WEBP', 'method': 7},
+])
+def test_bad_option_values(options):
+    with pytest.raises(ValueError):
+        EncoderOptions(**options).check()
+
+    EncoderOptions(quality=80, progressive=True, subsampling='4:2:0').check()
+
+
+def test_cached_bytes(tmpdir):
+    cache = RenderCache(tmpdir)
+    banner_factory = GeneratorFactory.banner(make_config(), cache=cache)
+    options = EncoderOptions(quality=90)
+
+    first = bytes(banner_factory.generate_bytes(**banner, options=options))
+    second = bytes(banner_factory.generate_bytes(**banner, options=options))
+    banner_factory.generate_bytes(**banner, options=EncoderOptions(quality=60))
+
+    assert first == second
+    assert cache.hits == 1 and cache.misses == 2
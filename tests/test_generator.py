@@ -0,0 +1,187 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import numpy as np
+from PIL import ImageDraw
+from core import GeneratorFactory, LayoutPlan, RenderCache
+from core.instrument import Instrument, Recorder
+from core.text import _can_reuse_masks, draw_text, mask_cache_clear, mask_cache_info
+
+from tests.helpers import make_config, records, banner
+
+
+def test_static_layers_composed_once():
+    config = make_config()
+    banner_factory = GeneratorFactory.banner(config)
+
+    banner_factory.generate(header='Steins;Gate', main_text='#3 anime in history')
+    base = banner_factory._static_layers()
+    banner_factory.generate(header='Gintama°', main_text='#2 anime in history', small_text='по данным')
+
+    assert banner_factory._static_layers() is base
+    assert not np.array_equal(np.asarray(base), np.asarray(config.background))
+
+
+def test_static_layers_follow_config():
+    banner_factory = GeneratorFactory.banner(make_config())
+    base = banner_factory._static_layers()
+
+    banner_factory.config = make_config()
+
+    assert banner_factory._static_layers() is not base
+
+
+@pytest.mark.parametrize('record', records())
+def test_layout_roundtrip_renders_same_image(record):
+    banner_factory = GeneratorFactory.banner(make_config())
+
+    plan = banner_factory.layout(**record)
+    restored = LayoutPlan.from_json(json.loads(json.dumps(plan.to_json())))
+
+    assert restored == plan
+    assert np.array_equal(np.asarray(banner_factory.render(restored)),
+                          np.asarray(banner_factory.generate(**record)))
+
+
+def test_layout_reports_sub_image_and_correctors():
+    banner_factory = GeneratorFactory.banner(make_config())
+
+    plan = banner_factory.layout(header='Steins;Gate', main_text='#3 anime in history', small_text='по данным')
+    assert plan.sub_image_fits and plan.sub_image is not None
+    assert plan.correctors == {'small_text': 0, 'site': 40}
+    assert plan.small_text.text == 'по данным'
+    assert plan.site.text == 'anime-recommend.ru'
+
+    plan = banner_factory.layout(header='Steins;Gate', main_text='#3 anime in history ' * 6, small_text='based on')
+    assert not plan.sub_image_fits and plan.sub_image is None
+    assert plan.correctors['small_text'] == 5
+
+
+def test_render_rejects_foreign_plan():
+    banner_factory = GeneratorFactory.banner(make_config())
+    plan = banner_factory.layout(header='Steins;Gate', main_text='#3 anime in history')
+    plan.size = (100, 100)
+
+    with pytest.raises(ValueError):
+        banner_factory.render(plan)
+
+
+def test_instrument_records_spans_and_counters(capsys):
+    recorder = Recorder()
+    data = GeneratorFactory.banner(make_config(), instrument=recorder).generate_bytes(**banner)
+
+    assert bytes(data) == bytes(GeneratorFactory.banner(make_config()).generate_bytes(**banner))
+    assert capsys.readouterr().out == ''
+
+    assert {'layout', 'render', 'static', 'wrap', 'draw', 'composite', 'encode'} <= set(recorder.totals)
+    assert recorder.calls['wrap'] == 2 and recorder.calls['layout'] == 1
+    assert recorder.counters['banners'] == 1
+    # subheader and small_text on top of the header and main text lines
+    assert recorder.counters['text_draws'] == recorder.counters['lines'] + 2
+    # plus the site, drawn once into the static layers, and the underline
+    assert recorder.calls['draw'] == recorder.counters['text_draws'] + 2
+
+    report = recorder.to_dict()
+    assert report['spans']['render']['total_ms'] >= report['spans']['draw']['total_ms']
+
+
+def test_instrument_counts_cache_hits(tmpdir):
+    class Counting(Instrument):
+        def __init__(self):
+            self.counts = {}
+
+        def count(self, name, value=1):
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    instrument = Counting()
+    banner_factory = GeneratorFactory.banner(make_config(), cache=RenderCache(tmpdir), instrument=instrument)
+
+    banner_factory.generate_bytes(**banner)
+    banner_factory.generate_bytes(**banner)
+
+    assert instrument.counts['cache_misses'] == 1 and instrument.counts['cache_hits'] == 1
+    assert instrument.counts['banners'] == 1
+
+
+def test_pooled_canvases_are_reset_between_renders():
+    banner_factory = GeneratorFactory.banner(make_config(), pool_size=1)
+    unpooled = GeneratorFactory.banner(make_config(), pool_size=0)
+
+    for record in records()[:4]:
+        assert bytes(banner_factory.generate_bytes(**record)) == bytes(unpooled.generate_bytes(**record))
+
+    pool = banner_factory._canvas_pool()
+    assert pool.allocated == 1 and pool.reused == 3 and pool.idle == 1
+    assert unpooled._canvas_pool().allocated == 4 and unpooled._canvas_pool().idle == 0
+
+
+def test_generate_never_hands_out_pooled_canvases():
+    banner_factory = GeneratorFactory.banner(make_config())
+
+    image = banner_factory.generate(**records()[0])
+    expected = np.array(image)
+    banner_factory.generate_bytes(**records()[1])
+
+    assert banner_factory._canvas_pool().idle == 1
+    assert np.array_equal(np.asarray(image), expected)
+
+
+@pytest.mark.parametrize('position', [(10, 12), (10.25, 12.75)])
+def test_cached_text_masks_draw_like_pillow(position):
+    config = make_config()
+    font = config.small_text_font
+    expected = config.background.copy()
+    ImageDraw.Draw(expected).text(position, 'по данным', '#ffffff', font=font)
+
+    before = mask_cache_info()
+    for _ in range(2):
+        image = config.background.copy()
+        draw_text(ImageDraw.Draw(image), position, 'по данным', '#ffffff', font)
+
+        assert np.array_equal(np.asarray(image), np.asarray(expected))
+
+    assert mask_cache_info().hits - before.hits >= 1
+    # the private calls the reuse goes through still work on the installed Pillow
+    assert _can_reuse_masks(font)
+
+
+def test_mask_cache_is_bounded_by_bytes(monkeypatch):
+    monkeypatch.setattr('core.text.MASK_CACHE_BYTES', 200_000)
+    mask_cache_clear()
+    banner_factory = GeneratorFactory.banner(make_config(), instrument=Recorder())
+
+    for i in range(20):
+        banner_factory.generate(**dict(banner, header=f'{banner["header"]} {i}', main_text=f'#{i} anime ever'))
+        assert 0 < mask_cache_info().bytes <= 200_000
+
+    # the strings every banner shares are still there
+    banner_factory.instrument.reset()
+    banner_factory.generate(**dict(banner, header='Steins;Gate', main_text='#3 anime'))
+    assert banner_factory.instrument.counters['mask_hits'] >= 2
+
+
+def test_instrument_counts_mask_hits():
+    recorder = Recorder()
+    banner_factory = GeneratorFactory.banner(make_config(), instrument=recorder)
+
+    banner_factory.generate(**banner)
+    recorder.reset()
+    banner_factory.generate(**banner)
+
+    assert recorder.counters['mask_misses'] == 0
+    assert recorder.counters['mask_hits'] == recorder.counters['text_draws']
+
+
+def test_generator_is_shared_safely_between_threads():
+    items = records()
+    expected = [bytes(GeneratorFactory.banner(make_config()).generate_bytes(**item)) for item in items]
+
+    # a fresh config, so the lazy loads and the static base are raced for as well
+    banner_factory = GeneratorFactory.banner(make_config(), instrument=Recorder())
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda item: bytes(banner_factory.generate_bytes(**item)), items * 3))
+
+    assert results == expected * 3
+    assert banner_factory.instrument.counters['banners'] == len(items) * 3
+    assert banner_factory._canvas_pool().idle <= banner_factory.pool_size
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from core import GeneratorFactory
+
+from tests.helpers import make_config, records
+
+
+def edits():
+    record = dict(records()[3])
+
+    yield record
+    yield dict(record, main_text=record['main_text'] + ' and counting')
+    yield dict(record, small_text='based on')
+    yield dict(record, subheader='Attack on Titan')
+    yield dict(record, subheader=None)
+    yield dict(record, header=record['header'] + ' (2019)')
+    yield dict(record, main_text='#1 anime in history, ' * 6)
+    yield record
+
+
+@pytest.mark.parametrize('reuse_masks', [True, False])
+def test_incremental_renders_match_full_renders(reuse_masks, monkeypatch):
+    # False: Pillow internals that differ from the checked versions, text goes through ImageDraw.text
+    monkeypatch.setattr('core.text._reuse_masks', reuse_masks)
+    banner_factory = GeneratorFactory.banner(make_config())
+    renderer = banner_factory.incremental()
+
+    for record in edits():
+        image = renderer.render(**record)
+
+        assert np.array_equal(np.asarray(image), np.asarray(banner_factory.generate(**record)))
+
+
+@pytest.mark.parametrize('field', ['main_text', 'small_text'])
+def test_only_the_edited_block_is_redrawn(field):
+    record = dict(records()[3])
+    renderer = GeneratorFactory.banner(make_config()).incremental()
+
+    renderer.render(**record)
+    assert renderer.regions is None
+
+    renderer.render(**dict(record, **{field: record[field] + '!'}))
+    header_bottom = max(item.position[1] for item in renderer.plan.header)
+
+    assert renderer.regions and all(top > header_bottom for _, top, _, _ in renderer.regions)
+
+    renderer.render(**dict(record, **{field: record[field] + '!'}))
+    assert renderer.regions == []
+
+
+def test_config_change_renders_in_full():
+    banner_factory = GeneratorFactory.banner(make_config())
+    renderer = banner_factory.incremental()
+    record = dict(records()[3])
+
+    renderer.render(**record)
+    banner_factory.config = make_config(text_color='#ff0000')
+    image = renderer.render(**record)
+
+    assert renderer.regions is None
+    assert np.array_equal(np.asarray(image), np.asarray(banner_factory.generate(**record)))
@@ -0,0 +1,63 @@
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from tests.regression import compare, compare_dirs, differing_tiles, hash_distance, main
+from tests.helpers import background_path
+
+
+def save(array: np.ndarray, path) -> str:
+    Image.fromarray(array).save(str(path))
+    return str(path)
+
+
+def background() -> np.ndarray:
+    with Image.open(background_path) as image:
+        return np.array(image)[:360, :480]
+
+
+def test_identical_images_match(tmpdir):
+    path = save(background(), tmpdir / 'a.png')
+
+    assert compare(path, save(background(), tmpdir / 'b.png'))
+
+
+def test_single_pixel_difference_is_located(tmpdir):
+    expected, actual = background(), background()
+    actual[300, 200, 1] ^= 1
+
+    assert differing_tiles(expected, actual) == [(256, 192)]
+
+    result = compare(save(expected, tmpdir / 'a.png'), save(actual, tmpdir / 'b.png'), diff_dir=tmpdir / 'diff')
+
+    assert not result and result.tiles == [(256, 192)]
+
+    heatmap = np.asarray(Image.open(str(tmpdir / 'diff' / 'b.diff.png')))
+    assert heatmap[300, 200, 0] > 0 and heatmap[300, 200, 1] == 0
+
+
+def test_prefilter_rejects_visible_changes(tmpdir):
+    expected, actual = background(), background()
+    actual[:, :240] = 255 - actual[:, :240]
+
+    assert hash_distance(expected, expected) == 0 and hash_distance(expected, actual) > 4
+
+    result = compare(save(expected, tmpdir / 'a.png'), save(actual, tmpdir / 'b.png'), prefilter=True)
+    assert not result and 'hash' in result.reason
+
+
+def test_compare_dirs(tmpdir, capsys):
+    expected_dir, actual_dir = tmpdir.mkdir('expected'), tmpdir.mkdir('actual')
+    changed = background()
+    changed[0, 0] = 0
+
+    for name in ('a.png', 'b.png', 'c.png'):
+        save(background(), expected_dir / name)
+    save(background(), actual_dir / 'a.png')
+    save(changed, actual_dir / 'b.png')
+
+    results = {Path(result.expected).name: result for result in compare_dirs(expected_dir, actual_dir, workers=2)}
+
+    assert results['a.png'] and not results['b.png'] and results['c.png'].reason == 'missing'
+    assert main([str(expected_dir), str(actual_dir), '-j', '2']) == 1
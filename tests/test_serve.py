@@ -0,0 +1,112 @@
+import asyncio
+import json
+import threading
+import http.client
+import pytest
+from core import GeneratorFactory
+from core.serve import RenderServer, QueueFull
+from core.utils import percentile
+
+from tests.helpers import make_config, banner
+
+
+@pytest.fixture
+def server(request):
+    max_queue = getattr(request, 'param', 8)
+    server = RenderServer(make_config(), workers=1, max_queue=max_queue, port=0)
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    def run(coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result(120)
+
+    run(server.start())
+    server.run = run
+
+    yield server
+
+    run(server.close())
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+
+
+def post(connection, body):
+    connection.request('POST', '/render', json.dumps(body), {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+
+    return response, response.read()
+
+
+def test_render_over_loopback(server):
+    connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=60)
+    expected = bytes(GeneratorFactory.banner(make_config()).generate_bytes(**banner))
+
+    response, data = post(connection, banner)
+    assert response.status == 200
+    assert response.getheader('Content-Type') == 'image/jpeg'
+    assert data == expected
+
+    # same keep-alive connection, different encoder
+    response, data = post(connection, dict(banner, options={'format': 'png'}))
+    assert response.status == 200
+    assert response.getheader('Content-Type') == 'image/png'
+
+    connection.request('GET', '/metrics')
+    metrics = json.loads(connection.getresponse().read())
+    assert metrics['requests'] == 3 and metrics['renders'] == 2
+    assert metrics['queue_depth'] == 0
+    assert metrics['latency_ms']['p50'] > 0
+
+
+@pytest.mark.parametrize('method, path, body, status', [
+    ('POST', '/render', {'main_text': 'no header'}, 400),
+    ('POST', '/render', dict(banner, options={'format': 'nope'}), 400),
+    ('POST', '/render', dict(banner, options={'colour': 'red'}), 400),
+    ('POST', '/render', dict(banner, options={'quality': 'x'}), 400),
+    ('POST', '/render', dict(banner, options={'format': 'PNG', 'compress_level': 12}), 400),
+    ('GET', '/render', None, 405),
+    ('GET', '/nowhere', None, 404),
+])
+def test_bad_requests(server, method, path, body, status):
+    connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=60)
+    connection.request(method, path, None if body is None else json.dumps(body))
+
+    response = connection.getresponse()
+    assert response.status == status
+    assert 'error' in json.loads(response.read())
+
+
+def test_identical_requests_coalesce(server):
+    async def burst():
+        return await asyncio.gather(*(server.render(dict(banner, options={})) for _ in range(5)))
+
+    results = server.run(burst())
+
+    assert len({data for data, _ in results}) == 1
+    assert [coalesced for _, coalesced in results].count(False) == 1
+    assert server.renders == 1 and server.coalesced == 4
+
+
+@pytest.mark.parametrize('server', [1], indirect=True)
+def test_full_queue_is_rejected(server):
+    async def burst():
+        records = [dict(banner, main_text=f'#{i} anime', options={}) for i in range(3)]
+        return await asyncio.gather(*(server.render(record) for record in records), return_exceptions=True)
+
+    results = server.run(burst())
+
+    assert sum(isinstance(result, QueueFull) for result in results) == 2
+    assert server.rejected == 2
+
+    connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=60)
+    connection.request('GET', '/health')
+    assert connection.getresponse().read() == b'ok'
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile(range(1, 101), 50) == 50
+    assert percentile(range(1, 101), 99) == 99
+    assert percentile([3.0], 95) == 3.0
@@ -0,0 +1,111 @@
+import pytest
+from PIL import ImageFont
+from core import find_suitable_fontsize, load_font, bruteforce
+from core.measure import TextMeasurer, get_measurer
+from core.linebreak import break_lines
+
+from tests.helpers import (
+    header_font, text_font, subheader_font, get_average_anime, get_shortest_anime, get_longest_anime
+)
+
+titles = [anime['header'] for anime in get_longest_anime()] + [anime['subheader'] for anime in get_average_anime()]
+
+
+def linear_fontsize(max_width, font, text, max_letters=40):
+    fontsize = 1
+    font = ImageFont.truetype(font.path, fontsize)
+
+    while font.getsize(text[0:max_letters])[0] < max_width:
+        fontsize += 1
+        font = ImageFont.truetype(font.path, fontsize)
+
+    return fontsize - 1
+
+
+@pytest.mark.parametrize('text', titles)
+@pytest.mark.parametrize('max_width', [300, 730])
+def test_find_suitable_fontsize_matches_linear_search(text, max_width):
+    for path in (header_font, subheader_font):
+        font = load_font(str(path), 64)
+
+        fitted = find_suitable_fontsize(max_width, font, text, len(text))
+
+        assert fitted.size == linear_fontsize(max_width, font, text, len(text))
+        assert fitted.path == font.path
+
+
+def test_fonts_are_shared():
+    font = load_font(str(header_font), 64)
+    first = find_suitable_fontsize(730, font, titles[0])
+
+    assert find_suitable_fontsize(730, font, titles[0]) is first
+    assert load_font(str(header_font), first.size) is first
+
+
+@pytest.mark.parametrize('text', titles)
+def test_measurer_close_to_exact(text):
+    measurer = TextMeasurer(load_font(str(header_font), 32))
+
+    assert abs(measurer.width(text) - measurer.width(text, exact=True)) < 0.02 * measurer.width(text, exact=True) + 4
+    assert measurer.width(text, exact=True) == measurer.font.getsize(text)[0]
+
+
+def test_measurer_counts_hits():
+    measurer = TextMeasurer(load_font(str(header_font), 32))
+
+    measurer.width('Gintama: The Final')
+    assert measurer.hits == 0 and measurer.misses == 4
+
+    measurer.width('The Final Gintama:')
+    assert measurer.hits == 4 and measurer.misses == 4
+    assert measurer.hit_rate == 0.5
+
+
+def test_bruteforce_uses_shared_measurer():
+    font = load_font(str(header_font), 33)
+    measurer = get_measurer(font)
+
+    lines = bruteforce(titles[0], 730, font)
+    misses = measurer.misses
+
+    assert bruteforce(titles[0], 730, font) == lines
+    assert measurer.misses == misses
+
+
+@pytest.mark.parametrize('anime', list(get_shortest_anime()) + list(get_longest_anime()))
+def test_break_lines_matches_bruteforce(anime):
+    header = find_suitable_fontsize(730, load_font(str(header_font), 64), anime['header'])
+    main = load_font(str(text_font), 40)
+
+    assert break_lines(anime['header'], 730, header, count=40) == bruteforce(anime['header'], 730, header)
+    assert break_lines(anime['main_text'], 500, main, count=40) == bruteforce(anime['main_text'], 500, main)
+
+
+@pytest.mark.parametrize('exact', [False, True])
+@pytest.mark.parametrize('text', titles)
+def test_break_lines_fill_width(text, exact):
+    font = load_font(str(subheader_font), 32)
+
+    lines = break_lines(text, 300, font, exact=exact)
+
+    assert ''.join(lines).replace(' ', '') == text.replace(' ', '')
+    for line in lines:
+        assert get_measurer(font).width(line, exact=exact) < 300 or len(line) == 1
+
+
+def test_break_lines_splits_cjk_per_character():
+    font = load_font(str(subheader_font), 32)
+    text = '真の仲間じゃないと勇者のパーティーを追い出されたので、辺境でスローライフすることにしました'
+
+    lines = break_lines(text, 200, font)
+
+    assert len(lines) > 1
+    assert ''.join(lines) == text
+    assert all(font.getsize(line)[0] < 200 for line in lines)
+
+
+def test_break_lines_never_gives_up():
+    font = load_font(str(header_font), 64)
+
+    assert break_lines('W' * 50, 10, font) == ['W'] * 50
+    assert break_lines('Gintama', 730, font, count=3) == ['Gin', 'tam', 'a']
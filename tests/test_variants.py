@@ -0,0 +1,55 @@
+import io
+import pytest
+from PIL import Image
+from core import GeneratorFactory, EncoderOptions, RenderCache, Recorder, Variant
+from core.variants import PRESETS, derive
+
+from tests.helpers import make_config, assert_same, banner
+
+
+def decode(data):
+    return Image.open(io.BytesIO(data))
+
+
+def test_variants_sizes_and_formats():
+    banner_factory = GeneratorFactory.banner(make_config())
+    variants = list(PRESETS.values()) + [Variant('tiny', 160, options=EncoderOptions('PNG'))]
+
+    outputs = banner_factory.generate_variants(variants, **banner)
+
+    assert list(outputs) == ['full', 'og', 'twitter', 'thumbnail', 'tiny']
+    assert {name: decode(data).size for name, data in outputs.items()} == {
+        'full': (1280, 720), 'og': (1200, 630), 'twitter': (1200, 600), 'thumbnail': (320, 180), 'tiny': (160, 90)
+    }
+    assert decode(outputs['tiny']).format == 'PNG'
+    assert outputs['full'] == bytes(banner_factory.generate_bytes(**banner))
+
+
+def test_derive_cascades_reductions():
+    image = GeneratorFactory.banner(make_config()).generate(**banner)
+    derived = derive(image, [Variant('quarter', 320), Variant('half', 640), Variant('crop', 600, 600)])
+
+    assert_same(derived['half'], image.reduce(2))
+    # the quarter size comes from the half size one, not from the full canvas again
+    assert_same(derived['quarter'], image.reduce(2).reduce(2))
+    assert derived['crop'].size == (600, 600)
+
+
+def test_variants_are_cached_individually(tmpdir):
+    recorder = Recorder()
+    banner_factory = GeneratorFactory.banner(make_config(), cache=RenderCache(tmpdir), instrument=recorder)
+
+    first = banner_factory.generate_variants([PRESETS['full'], PRESETS['thumbnail']], **banner)
+    second = banner_factory.generate_variants([PRESETS['thumbnail'], PRESETS['og']], **banner)
+
+    assert second['thumbnail'] == first['thumbnail']
+    assert recorder.counters['cache_hits'] == 1 and recorder.counters['cache_misses'] == 3
+    assert recorder.counters['banners'] == 2
+
+    banner_factory.generate_variants([PRESETS['og']], **banner)
+    assert recorder.counters['banners'] == 2
+
+
+def test_variant_names_must_be_unique():
+    with pytest.raises(ValueError):
+        GeneratorFactory.banner(make_config()).generate_variants([Variant('a'), Variant('a', 320)], **banner)